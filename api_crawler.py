@@ -1,13 +1,27 @@
+import concurrent.futures
 import math
+import queue
 import time
-import json
 import sys
+import threading
 import requests
 from colorama import init, Fore
 from dotenv import load_dotenv
 import os
-from utils import logger, ErrorHandler
-from sign_generator import generate_signature_headers
+from utils import logger
+from sign_generator import SigningContext
+from window_planner import CrawlWindowPlanner, WindowPlanError
+from crawl_pipeline import CrawlPipeline
+from http_transport import HttpTransport
+from request_engine import AUTH_EXPIRED, OK, RETRY, RequestEngine, RetryPolicy, TokenBucket, is_token_expired_message
+from concurrency_controller import AIMDConcurrencyController
+from detail_cache import STATUS_FIELDS, DetailCache
+from detail_parser import DetailParser
+from order_fingerprints import OrderFingerprintStore, order_fingerprint
+from auth_scheduler import AuthRefreshScheduler, auth_token
+from auth_store import auth_store
+from crawl_state import CrawlCheckpoint, HighWaterMarkStore, crawl_checkpoint_key
+from order_rows import OrderPage, order_to_dict
 
 # 本地存储文件路径
 AUTH_STORAGE_FILE = 'auth_cache.json'
@@ -26,9 +40,113 @@ class APICrawler:
         self.request_delay = float(os.getenv('REQUEST_DELAY', '0.01'))
         self.max_retries = int(os.getenv('MAX_RETRIES', '3'))
         self.page_size = int(os.getenv('PAGE_SIZE', '20'))
+        # 列表页预取深度：处理当前页详情的同时，后台提前获取后续N页列表（0表示串行）
+        self.list_prefetch_depth = max(0, int(os.getenv('LIST_PREFETCH_DEPTH', '1')))
+        # 时间窗口分片：将日期范围按createStartTime/createEndTime拆成N个子窗口并行爬取（1表示不分片）
+        self.crawl_window_shards = max(1, int(os.getenv('CRAWL_WINDOW_SHARDS', '1')))
+        self.crawl_shard_workers = max(1, int(os.getenv('CRAWL_SHARD_WORKERS', str(self.crawl_window_shards))))
+        # 自适应窗口规划：按totalCount二分时间窗口，直到每个窗口不超过N页（0表示不启用）
+        self.max_pages_per_window = max(0, int(os.getenv('CRAWL_MAX_PAGES_PER_WINDOW', '0')))
+        self.last_crawl_plan = None
+        self._window_planner = None
+        # 订单详情并发worker数（整个爬取过程共用一个常驻线程池）
+        self.detail_workers = max(1, int(os.getenv('DETAIL_WORKERS', '5')))
+        # 详情并发自适应调整范围：以DETAIL_WORKERS为初始值，在[MIN, MAX]之间按AIMD增减
+        self.detail_min_workers = max(1, int(os.getenv('DETAIL_MIN_WORKERS', '1')))
+        self.detail_max_workers = max(self.detail_workers, int(os.getenv('DETAIL_MAX_WORKERS', str(max(20, self.detail_workers)))))
+        # 流水线各阶段有界队列长度：详情队列（待获取详情）、存储队列（待写入存储）
+        self.detail_queue_size = max(1, int(os.getenv('DETAIL_QUEUE_SIZE', str(max(self.page_size, self.detail_workers) * 2))))
+        self.storage_queue_size = max(1, int(os.getenv('STORAGE_QUEUE_SIZE', str(max(self.page_size, self.detail_workers) * 2))))
+        self._pipeline = None
+        self._stop_event = None
+        # keep-alive连接池：默认容纳全部详情worker和各分片的列表请求（含预取）
+        default_pool_size = self.detail_max_workers + self.crawl_shard_workers * (self.list_prefetch_depth + 1)
+        self.http_pool_size = max(1, int(os.getenv('HTTP_POOL_SIZE', str(default_pool_size))))
+        self.http = HttpTransport(pool_size=self.http_pool_size, timeout=30)
+        # 统一请求引擎：全局令牌桶限速（次/秒，0表示不限速）+ 带抖动的指数退避重试
+        self.api_rate_limit = max(0.0, float(os.getenv('API_RATE_LIMIT', '0')))
+        self.api_rate_burst = max(1, int(os.getenv('API_RATE_BURST', str(max(1, int(self.api_rate_limit))))))
+        self.request_engine = RequestEngine(
+            self.http,
+            rate_limiter=TokenBucket(self.api_rate_limit, self.api_rate_burst),
+            policy=RetryPolicy(
+                max_retries=self.max_retries,
+                base_delay=float(os.getenv('RETRY_BASE_DELAY', '0.1')),
+                max_delay=float(os.getenv('RETRY_MAX_DELAY', '10')),
+                busy_resp_codes=os.getenv('RETRYABLE_RESP_CODES', '').split(','),
+            ),
+            refresh_auth=self._refresh_auth_from_browser,
+            add_log=self.add_log,
+        )
+        self.detail_concurrency = AIMDConcurrencyController(
+            initial_limit=self.detail_workers,
+            min_limit=self.detail_min_workers,
+            max_limit=self.detail_max_workers,
+            on_change=self._on_concurrency_change,
+        )
+        self.request_engine.add_listener(self._on_api_attempt)
+        # 详情解析：DETAIL_FIELDS不为空时只保留其中的列（缓存判断终态所需的状态列始终保留）
+        detail_fields = [field.strip() for field in (os.getenv('DETAIL_FIELDS') or '').split(',') if field.strip()]
+        if detail_fields:
+            detail_fields.extend(STATUS_FIELDS)
+        self.detail_parser = DetailParser(detail_fields)
+        # 订单详情本地缓存：状态在DETAIL_CACHE_FINAL_STATUSES白名单中的终态订单永久缓存，其他订单缓存DETAIL_CACHE_TTL秒
+        self.detail_cache = None
+        if (os.getenv('DETAIL_CACHE_ENABLED') or '1').strip().lower() not in ('0', 'false', 'no', 'off'):
+            try:
+                self.detail_cache = DetailCache(
+                    (os.getenv('DETAIL_CACHE_FILE') or 'data/detail_cache.sqlite3').strip(),
+                    ttl_seconds=float(os.getenv('DETAIL_CACHE_TTL', '3600')),
+                    max_entries=int(os.getenv('DETAIL_CACHE_MAX_ENTRIES', '200000')),
+                    final_statuses=[status for status in (os.getenv('DETAIL_CACHE_FINAL_STATUSES') or '').split(',') if status.strip()],
+                )
+            except Exception as e:
+                print(Fore.YELLOW + f"订单详情缓存初始化失败，将不使用缓存: {str(e)}")
+                logger.warning(f"订单详情缓存初始化失败，将不使用缓存: {str(e)}")
+        # 列表行指纹：状态/金额字段与上次推送成功时相同的订单直接使用本地缓存的详情（即使已过期），不再请求详情接口；
+        # 订单仍照常写入存储
+        self.fingerprint_store = None
+        if (os.getenv('SKIP_UNCHANGED_ORDERS') or '0').strip().lower() in ('1', 'true', 'yes', 'on'):
+            try:
+                self.fingerprint_store = OrderFingerprintStore(
+                    (os.getenv('ORDER_FINGERPRINT_FILE') or 'data/order_fingerprints.sqlite3').strip()
+                )
+            except Exception as e:
+                print(Fore.YELLOW + f"订单指纹存储初始化失败，将请求所有订单详情: {str(e)}")
+                logger.warning(f"订单指纹存储初始化失败，将请求所有订单详情: {str(e)}")
+        self.unchanged_count = 0
+        self._unchanged_order_nos = set()
+        self._pending_fingerprints = {}
+        self._delivery_listener_registered = False
+        # 爬取模式：range按GUI选择的时间范围爬取；incremental从该账号上次的水位（减去重叠时间）爬到当前时间
+        self.crawl_mode = (os.getenv('CRAWL_MODE') or 'range').strip().lower()
+        self.incremental_overlap_ms = int(float(os.getenv('INCREMENTAL_OVERLAP_SECONDS', '300')) * 1000)
+        self.watermark_store = HighWaterMarkStore((os.getenv('CRAWL_WATERMARK_FILE') or 'data/crawl_watermarks.json').strip())
+        self.account_id = None
+        # 断点续爬：每页记录检查点，中断后以相同参数重新爬取时从检查点继续
+        self.checkpoint_enabled = (os.getenv('CRAWL_CHECKPOINT_ENABLED') or '1').strip().lower() not in ('0', 'false', 'no', 'off')
+        self.checkpoint_dir = (os.getenv('CRAWL_CHECKPOINT_DIR') or 'data/checkpoints').strip()
+        self._checkpoint = None
+        self._listed_count = 0
+        self._max_create_time = None
         self.order_data = []
+        # 已写入订单的去向（列表或流式缓冲队列），由crawl_orders_by_api / iter_orders_by_api设置
+        self._order_sink = None
         self.is_running = False
+        # 认证信息刷新：同一时间只有一个线程真正去浏览器线程刷新，其余线程等待同一次结果
+        self.auth_refresh_timeout = float(os.getenv('AUTH_REFRESH_TIMEOUT', '30'))
+        self._auth_refresh_lock = threading.Lock()
+        self._auth_update_lock = threading.Lock()
+        self._auth_refreshed_at = 0.0
+        # 签名上下文：(认证信息快照, {请求方法: SigningContext})，认证信息整体替换后重建
+        self._signing_contexts = (None, {})
+        # 主动刷新：token有效期（秒）及提前刷新的时间，实际有效期会根据token过期响应自动校正
+        self.auth_token_ttl = float(os.getenv('AUTH_TOKEN_TTL', '3600'))
+        self.auth_refresh_margin = float(os.getenv('AUTH_REFRESH_MARGIN', '120'))
+        self.auth_proactive_refresh = (os.getenv('AUTH_PROACTIVE_REFRESH') or '1').strip().lower() not in ('0', 'false', 'no', 'off')
+        self.auth_scheduler = AuthRefreshScheduler(self, token_ttl=self.auth_token_ttl, refresh_margin=self.auth_refresh_margin)
         self.auth_info = self.load_auth_info()
+        self.auth_obtained_at = self._stored_auth_obtained_at() if self.auth_info else None
 
     def _load_env_file(self):
         """加载.env文件，支持打包后的程序"""
@@ -60,10 +178,11 @@ class APICrawler:
             auth_data = {
                 'auth_info': auth_info,
                 'timestamp': time.time(),
+                # token的获取时间，重启后据此计算主动刷新时间
+                'obtained_at': getattr(self, 'auth_obtained_at', None) or time.time(),
                 'expires_at': time.time() + (24 * 60 * 60)  # 24小时过期
             }
-            with open(AUTH_STORAGE_FILE, 'w', encoding='utf-8') as f:
-                json.dump(auth_data, f, indent=2)
+            auth_store.save(AUTH_STORAGE_FILE, auth_data, indent=2)
             print(Fore.GREEN + "认证信息已保存到本地")
             logger.info("认证信息已保存到本地")
             self.add_log("认证信息已保存到本地", 'green')
@@ -75,10 +194,8 @@ class APICrawler:
     def load_auth_info(self):
         """从本地文件加载认证信息"""
         try:
-            if os.path.exists(AUTH_STORAGE_FILE):
-                with open(AUTH_STORAGE_FILE, 'r', encoding='utf-8') as f:
-                    auth_data = json.load(f)
-                
+            auth_data = auth_store.load(AUTH_STORAGE_FILE)
+            if auth_data is not None:
                 # 检查是否过期
                 if time.time() < auth_data.get('expires_at', 0):
                     print(Fore.GREEN + "从本地加载认证信息成功")
@@ -89,21 +206,33 @@ class APICrawler:
                     print(Fore.YELLOW + "认证信息已过期")
                     logger.info("认证信息已过期")
                     self.add_log("认证信息已过期", 'yellow')
-                    os.remove(AUTH_STORAGE_FILE)
+                    auth_store.remove(AUTH_STORAGE_FILE)
         except Exception as e:
             print(Fore.RED + f"加载认证信息失败: {str(e)}")
             logger.error(f"加载认证信息失败: {str(e)}")
             self.add_log(f"加载认证信息失败: {str(e)}", 'red')
         return {}
     
+    def _stored_auth_obtained_at(self):
+        """本地认证文件中token的获取时间：优先使用保存的obtained_at，旧文件使用文件修改时间"""
+        try:
+            auth_data = auth_store.load(AUTH_STORAGE_FILE) or {}
+            if auth_data.get('obtained_at'):
+                return float(auth_data['obtained_at'])
+            return os.path.getmtime(AUTH_STORAGE_FILE)
+        except Exception as e:
+            logger.warning(f"读取认证信息获取时间失败，按当前时间计算: {str(e)}")
+            return time.time()
+
     def is_auth_valid(self):
         """检查认证信息是否有效"""
+        auth_info = self.auth_info  # 取一次快照，避免检查过程中被其他线程替换
         # 检查认证信息是否存在
-        if not self.auth_info:
+        if not auth_info:
             return False
         
         # 检查是否有有效的token
-        if not (self.auth_info.get('token') or self.auth_info.get('pp_token')):
+        if not (auth_info.get('token') or auth_info.get('pp_token')):
             return False
         
         # 检查认证信息是否过期（如果有过期时间）
@@ -115,13 +244,18 @@ class APICrawler:
         return True
     
     def update_auth_info(self, new_auth_info):
-        """更新认证信息并保存"""
-        merged_auth_info = dict(self.auth_info or {})
-        merged_auth_info.update(new_auth_info or {})
-        self.auth_info = merged_auth_info
-        # 设置认证信息过期时间（1小时）
-        self.auth_expires_at = time.time() + (60 * 60)
-        self.save_auth_info(self.auth_info)
+        """更新认证信息并保存（整体替换为新字典，其他线程只会读到完整的旧值或新值）"""
+        with self._auth_update_lock:
+            merged_auth_info = dict(self.auth_info or {})
+            merged_auth_info.update(new_auth_info or {})
+            if auth_token(merged_auth_info) != auth_token(self.auth_info):
+                # 换了新token：记录获取时间，供主动刷新和并发刷新去重使用
+                self.auth_obtained_at = time.time()
+                self._auth_refreshed_at = time.monotonic()
+            # 设置认证信息过期时间（默认1小时，观察到更短的实际有效期时以观察值为准）
+            self.auth_expires_at = time.time() + self.auth_scheduler.effective_ttl()
+            self.auth_info = merged_auth_info
+        self.save_auth_info(merged_auth_info)
     
     def add_log(self, message, log_type='info'):
         try:
@@ -129,554 +263,286 @@ class APICrawler:
         except Exception as e:
             print(f"添加日志失败: {e}")
     
+    def _empty_pagination(self, page_number, failed=False):
+        """空的分页信息；failed为True表示请求失败（而不是该范围内没有订单）"""
+        pagination = {
+            'current': page_number,
+            'total': 0,
+            'size': self.page_size,
+            'pages': 0
+        }
+        if failed:
+            pagination['failed'] = True
+        return pagination
+
+    def _ensure_auth_info(self):
+        """认证信息无效时，从配置文件或浏览器线程重新获取，返回是否可用"""
+        if self.is_auth_valid():
+            return True
+        stale_since = time.monotonic()
+
+        # 检查是否跳过浏览器操作
+        if hasattr(self.browser_manager, 'skip_browser') and self.browser_manager.skip_browser:
+            auth_info = self.browser_manager.get_auth_info()
+            if auth_info and (auth_info.get('token') or auth_info.get('pp_token')):
+                self.update_auth_info(auth_info)
+                return True
+            print(Fore.RED + "配置文件中的认证信息不完整，请检查config.json文件")
+            self.add_log("配置文件中的认证信息不完整，请检查config.json文件", 'red')
+            return False
+
+        # 检查self.page是否为None，如果是，则重新初始化
+        if not self.page:
+            self.page = self.browser_manager.page
+            if not self.page:
+                print(Fore.RED + "无法获取浏览器页面，请先登录")
+                self.add_log("无法获取浏览器页面，请先登录", 'red')
+                return False
+
+        if self._refresh_auth_from_browser(stale_since):
+            return True
+        print(Fore.RED + "无法从浏览器获取认证信息，请先登录")
+        self.add_log("无法从浏览器获取认证信息，请先登录", 'red')
+        return False
+
+    def _refresh_auth_from_browser(self, stale_since=None):
+        """让browser_thread重新获取认证信息并更新，返回是否更新成功
+
+        stale_since为调用方发现认证失效的时间（time.monotonic()），如果在此之后已有其他线程完成刷新，
+        直接使用新的认证信息；否则由第一个拿到锁的线程去刷新，其余线程在锁上等待结果。
+        """
+        if stale_since is None:
+            stale_since = time.monotonic()
+        with self._auth_refresh_lock:
+            if self._auth_refreshed_at > stale_since and self.is_auth_valid():
+                return True
+            browser_auth_info = None
+            if hasattr(self, 'browser_thread') and self.browser_thread:
+                # 提交刷新请求并等待浏览器线程完成（完成后立即唤醒，没有固定等待）
+                browser_auth_info = self.browser_thread.refresh_auth_info(timeout=self.auth_refresh_timeout)
+            
+            if browser_auth_info and (browser_auth_info.get('token') or browser_auth_info.get('pp_token')):
+                self.update_auth_info(browser_auth_info)
+                self._auth_refreshed_at = time.monotonic()
+                return True
+            return False
+
+    def fetch_auth_from_source(self):
+        """从浏览器线程（或跳过浏览器时从配置文件）获取最新认证信息，不更新当前认证信息"""
+        if hasattr(self, 'browser_thread') and self.browser_thread:
+            return self.browser_thread.refresh_auth_info(timeout=self.auth_refresh_timeout)
+        if getattr(self.browser_manager, 'skip_browser', False):
+            return self.browser_manager.get_auth_info()
+        return None
+
+    def _start_auth_scheduler(self):
+        """爬取开始时启动主动刷新线程，爬取结束时由_stop_auth_scheduler停止"""
+        if not self.auth_proactive_refresh or self.auth_scheduler.is_alive():
+            return
+        if self.auth_scheduler.ident is not None:
+            # 上次爬取已停止的线程不能再次启动，换一个新线程
+            self.auth_scheduler = self.auth_scheduler.restarted()
+        self.auth_scheduler.start()
+
+    def _stop_auth_scheduler(self):
+        if self.auth_scheduler.is_alive():
+            self.auth_scheduler.stop(timeout=5)
+
+    def _is_token_expired_message(self, error_message):
+        return is_token_expired_message(error_message)
+
+    def _signing_context(self, auth_info, method):
+        """返回认证信息快照对应的签名上下文，认证信息被整体替换后自动重建"""
+        cached_auth_info, contexts = self._signing_contexts
+        if cached_auth_info is not auth_info:
+            contexts = {}
+            self._signing_contexts = (auth_info, contexts)
+        context = contexts.get(method)
+        if context is not None:
+            return context
+
+        token = auth_info.get('token', '') or auth_info.get('pp_token', '')
+        device_id = auth_info.get('deviceId', '') or auth_info.get('pp_device_id', '')
+        country_code = 'gsa'  # 使用'gsa'，与test_order_list.py一致
+        if method == 'POST':
+            merchantid = auth_info.get('merchantid', '') or auth_info.get('merchantId', '125072409535231')
+            header_overrides = None
+        else:
+            merchantid = auth_info.get('merchantid', '') or auth_info.get('merchantId', '')
+            # GET请求的sec-ch-ua和user-agent替换为与curl一致的值
+            header_overrides = {
+                'sec-ch-ua': '"Chromium";v="143", "Not A(Brand";v="24"',
+                'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36',
+            }
+        context = SigningContext(token, device_id, country_code, method=method, merchantid=merchantid,
+                                 header_overrides=header_overrides)
+        contexts[method] = context
+        return context
+
+    def _build_signed_headers(self, params, method='POST'):
+        """使用当前认证信息生成带签名的请求头"""
+        auth_info = self.auth_info or {}  # 取一次快照，保证token、deviceId等来自同一份认证信息
+        return self._signing_context(auth_info, method).headers(params)
+
+    def _build_detail_headers(self, params):
+        """生成详情请求头，重试前先更新timestamp参数，保证签名使用的时间戳是新的"""
+        params['timestamp'] = int(time.time() * 1000)
+        return self._build_signed_headers(params, method='GET')
+
+    def _build_order_list_params(self, start_timestamp, end_timestamp, page_number, page_size, settlement_status=None):
+        params = {
+            'current': page_number,
+            'pageSize': page_size,
+            'orderTypes': ["300-0"],
+            'pageIndex': page_number,
+            'createStartTime': start_timestamp,
+            'createEndTime': end_timestamp,
+            'countryCodes': ['GH'],
+            'startOrderAmount': None,
+            'endOrderAmount': None
+        }
+        
+        # 根据settlement_status控制orderStatus参数
+        if settlement_status == '2':
+            params['orderStatus'] = "2"
+        # 如果为'None'则不添加orderStatus参数
+        return params
+
+    def _build_order_detail_params(self, order_no, order_type):
+        return {
+            'orderNo': order_no,
+            'orderType': order_type,
+            'dataSource': 'lindorm',  # 添加dataSource参数
+            'timestamp': int(time.time() * 1000)
+        }
+
+    def _parse_order_list_response(self, api_response, page_number):
+        """解析respCode为成功的订单列表响应，返回订单列表和分页信息"""
+        data = api_response.get('data', {})
+        # 确保获取到list字段
+        data_list = data.get('list', [])
+        
+        # 获取分页信息
+        current_page = data.get('current', page_number)
+        # 优先使用 totalCount 字段，然后使用 total 字段
+        total = data.get('totalCount', data.get('total', 0))
+        size = data.get('size', self.page_size)
+        pages = data.get('pages', 0)
+        
+        # 计算当前页的起始和结束位置
+        start_item = (current_page - 1) * size + 1
+        end_item = min(current_page * size, total)
+        
+        # 打印详细的分页信息（更加醒目）
+        print(Fore.CYAN + "=" * 60)
+        print(Fore.CYAN + f"【分页信息】当前页: {current_page} | 总页数: {pages} | 总条数: {total}")
+        print(Fore.CYAN + f"【分页信息】当前页范围: 第 {start_item} 到第 {end_item} 条")
+        print(Fore.CYAN + "=" * 60)
+        logger.info(f"获取到第 {current_page} 页，共 {pages} 页，总 {total} 条订单")
+        self.add_log(f"【分页信息】第 {current_page}/{pages} 页，共 {total} 条订单", 'cyan')
+        
+        # 转换为订单行（OrderRow），写入存储时才转换为字典
+        orders = OrderPage.from_items(data_list)
+        
+        # 返回订单列表和分页信息
+        return orders, {
+            'current': current_page,
+            'total': total,
+            'size': size,
+            'pages': pages
+        }
+
     def get_order_list_from_api(self, start_timestamp=None, end_timestamp=None, page_number=1, page_size=20, settlement_status=None):
         """通过API直接获取订单列表"""
-        orders = []
-        
         try:
-            # 直接使用传入的时间戳
-            start_time = start_timestamp
-            end_time = end_timestamp
-            
             # 获取认证信息
-            if not self.is_auth_valid():
-                # 检查是否跳过浏览器操作
-                if hasattr(self.browser_manager, 'skip_browser') and self.browser_manager.skip_browser:
-                    auth_info = self.browser_manager.get_auth_info()
-                    if auth_info and (auth_info.get('token') or auth_info.get('pp_token')):
-                        self.update_auth_info(auth_info)
-                    else:
-                        print(Fore.RED + "配置文件中的认证信息不完整，请检查config.json文件")
-                        self.add_log("配置文件中的认证信息不完整，请检查config.json文件", 'red')
-                        return orders, {
-                            'current': page_number,
-                            'total': 0,
-                            'size': self.page_size,
-                            'pages': 0
-                        }
-                else:
-                    # 检查self.page是否为None，如果是，则重新初始化
-                    if not self.page:
-                        self.page = self.browser_manager.page
-                        if not self.page:
-                            print(Fore.RED + "无法获取浏览器页面，请先登录")
-                            self.add_log("无法获取浏览器页面，请先登录", 'red')
-                            return orders, {
-                                'current': page_number,
-                                'total': 0,
-                                'size': self.page_size,
-                                'pages': 0
-                            }
-                    
-                    # 从browser_thread的共享变量中获取认证信息
-                    browser_auth_info = None
-                    if hasattr(self, 'browser_thread') and self.browser_thread:
-                        # 添加操作到browser_thread的队列，让它更新认证信息
-                        self.browser_thread.add_operation({
-                            'type': 'get_auth_info',
-                            'callback': None  # 不需要回调，直接从共享变量读取
-                        })
-                        
-                        # 等待一段时间让browser_thread执行操作并更新共享变量
-                        time.sleep(3)  # 等待3秒让browser_thread执行操作
-                        
-                        # 从共享变量中读取认证信息
-                        with self.browser_thread.auth_info_lock:
-                            browser_auth_info = self.browser_thread.shared_auth_info
-                    
-                    if browser_auth_info and (browser_auth_info.get('token') or browser_auth_info.get('pp_token')):
-                        self.update_auth_info(browser_auth_info)
-                    else:
-                        print(Fore.RED + "无法从浏览器获取认证信息，请先登录")
-                        self.add_log("无法从浏览器获取认证信息，请先登录", 'red')
-                        return orders, {
-                            'current': page_number,
-                            'total': 0,
-                            'size': self.page_size,
-                            'pages': 0
-                        }
+            if not self._ensure_auth_info():
+                return [], self._empty_pagination(page_number, failed=True)
             
-            # 构造请求参数
-            params = {
-                'current': page_number,
-                'pageSize': page_size,
-                'orderTypes': ["300-0"],
-                'pageIndex': page_number,
-                'createStartTime': start_time,
-                'createEndTime': end_time,
-                'countryCodes': ['GH'],
-                'startOrderAmount': None,
-                'endOrderAmount': None
-            }
-            
-            # 根据settlement_status控制orderStatus参数
-            if settlement_status == '2':
-                params['orderStatus'] = "2"
-            # 如果为'None'则不添加orderStatus参数
-            
-            # 生成时间戳
-            timestamp = int(time.time() * 1000)
-            
-            # 获取认证信息
-            token = self.auth_info.get('token', '') or self.auth_info.get('pp_token', '')
-            device_id = self.auth_info.get('deviceId', '') or self.auth_info.get('pp_device_id', '')
-            country_code = 'gsa'  # 使用'gsa'，与test_order_list.py一致
-            merchantid = self.auth_info.get('merchantid', '') or self.auth_info.get('merchantId', '125072409535231')
-            
-            # 生成包含签名的请求头（使用POST方法）
-            headers = generate_signature_headers(token, device_id, country_code, params, method='POST', merchantid=merchantid)
-            
-            # 实现带重试机制的API请求，处理服务器繁忙错误
-            retry_count = 0
-            max_retries = 5
-            base_delay = 0.1  # 基础延迟时间（秒）
+            # 构造请求参数（直接使用传入的时间戳）
+            params = self._build_order_list_params(start_timestamp, end_timestamp, page_number, page_size, settlement_status)
             
-            while retry_count < max_retries:
-                try:
-                    # 添加指数退避延迟
-                    delay = base_delay * (2 ** retry_count)
-                    if delay > 1:
-                        time.sleep(delay)
-                    else:
-                        # 延迟小于1秒时不打印日志，直接休眠
-                        time.sleep(delay)
-                    
-                    # 发起API请求
-                    response = requests.post(
-                        self.order_list_api,
-                        json=params,
-                        headers=headers,
-                        timeout=30
-                    )
-                    
-                    # 如果请求成功，跳出重试循环
-                    if response.status_code == 200:
-                        break
-                    
-                    # 如果服务器返回503（服务不可用）或429（请求过多），继续重试
-                    if response.status_code in [503, 429]:
-                        retry_count += 1
-                        continue
-                    
-                    # 其他错误状态码，直接跳出重试循环
-                    break
-                    
-                except requests.exceptions.RequestException as e:
-                    retry_count += 1
-                    if retry_count >= max_retries:
-                        print(Fore.RED + f"请求失败，已达到最大重试次数")
-                        self.add_log("请求失败，已达到最大重试次数", 'red')
-                        return orders, {
-                            'current': page_number,
-                            'total': 0,
-                            'size': self.page_size,
-                            'pages': 0
-                        }
-            
-            if response.status_code == 200:
-                try:
-                    api_response = response.json()
-                    
-                    if api_response and 'error' not in api_response:
-                        # 解析API响应
-                        if api_response.get('respCode') == '00000000':
-                            data = api_response.get('data', {})
-                            # 确保获取到list字段
-                            data_list = data.get('list', [])
-                            
-                            # 获取分页信息
-                            current_page = data.get('current', page_number)
-                            # 优先使用 totalCount 字段，然后使用 total 字段
-                            total = data.get('totalCount', data.get('total', 0))
-                            size = data.get('size', self.page_size)
-                            pages = data.get('pages', 0)
-                            
-                            # 计算当前页的起始和结束位置
-                            start_item = (current_page - 1) * size + 1
-                            end_item = min(current_page * size, total)
-                            
-                            # 打印详细的分页信息（更加醒目）
-                            print(Fore.CYAN + "=" * 60)
-                            print(Fore.CYAN + f"【分页信息】当前页: {current_page} | 总页数: {pages} | 总条数: {total}")
-                            print(Fore.CYAN + f"【分页信息】当前页范围: 第 {start_item} 到第 {end_item} 条")
-                            print(Fore.CYAN + "=" * 60)
-                            logger.info(f"获取到第 {current_page} 页，共 {pages} 页，总 {total} 条订单")
-                            self.add_log(f"【分页信息】第 {current_page}/{pages} 页，共 {total} 条订单", 'cyan')
-                            
-                            # 转换为订单对象
-                            for item in data_list:
-                                order = {
-                                    'order_no': item.get('orderNo', ''),
-                                    'order_type': item.get('orderType', ''),
-                                    'order_status': item.get('orderStatus', ''),
-                                    'order_amount': item.get('orderAmount', ''),
-                                    'create_time': item.get('createTime', ''),
-                                    'settlement_status': item.get('settlementStatus', ''),
-                                    'settlement_amount': item.get('settlementAmount', ''),
-                                    'settlement_time': item.get('settlementTime', ''),
-                                    'country_code': item.get('countryCode', ''),
-                                    'merchant_id': item.get('merchantId', ''),
-                                    'pay_id': item.get('payId', ''),
-                                    'out_order_no': item.get('outOrderNo', ''),
-                                    'user_mobile_no': item.get('payerAccountNo', '')  # 从订单列表中获取用户手机号
-                                }
-                                orders.append(order)
-                            
-                            # 返回订单列表和分页信息
-                            return orders, {
-                                'current': current_page,
-                                'total': total,
-                                'size': size,
-                                'pages': pages
-                            }
-                        else:
-                            error_message = api_response.get('respMsg', 'Unknown error')
-                            print(Fore.RED + f"API返回错误: {error_message}")
-                            self.add_log(f"API返回错误: {error_message}", 'red')
-                            
-                            # 处理token过期错误
-                            if 'token time out' in error_message or 'token expired' in error_message:
-                                # 从browser_thread的共享变量中获取认证信息
-                                browser_auth_info = None
-                                if hasattr(self, 'browser_thread') and self.browser_thread:
-                                    # 添加操作到browser_thread的队列，让它更新认证信息
-                                    self.browser_thread.add_operation({
-                                        'type': 'get_auth_info',
-                                        'callback': None  # 不需要回调，直接从共享变量读取
-                                    })
-                                    
-                                    # 等待一段时间让browser_thread执行操作并更新共享变量
-                                    time.sleep(3)  # 等待3秒让browser_thread执行操作
-                                    
-                                    # 从共享变量中读取认证信息
-                                    with self.browser_thread.auth_info_lock:
-                                        browser_auth_info = self.browser_thread.shared_auth_info
-                                
-                                if browser_auth_info and (browser_auth_info.get('token') or browser_auth_info.get('pp_token')):
-                                    self.update_auth_info(browser_auth_info)
-                                    
-                                    # 重新生成请求头
-                                    token = self.auth_info.get('token', '') or self.auth_info.get('pp_token', '')
-                                    device_id = self.auth_info.get('deviceId', '') or self.auth_info.get('pp_device_id', '')
-                                    merchantid = self.auth_info.get('merchantid', '') or self.auth_info.get('merchantId', '')
-                                    headers = generate_signature_headers(token, device_id, country_code, params, method='POST', merchantid=merchantid)
-                                    
-                                    # 重新发起API请求
-                                    time.sleep(self.request_delay)
-                                    
-                                    response = requests.post(
-                                        self.order_list_api,
-                                        json=params,
-                                        headers=headers,
-                                        timeout=30
-                                    )
-                                    
-                                    if response.status_code == 200:
-                                        new_api_response = response.json()
-                                        
-                                        if new_api_response.get('respCode') == '00000000':
-                                            data = new_api_response.get('data', {})
-                                            data_list = data.get('list', [])
-                                            
-                                            # 解析订单数据
-                                            for item in data_list:
-                                                order = {
-                                                    'order_no': item.get('orderNo', ''),
-                                                    'order_type': item.get('orderType', ''),
-                                                    'order_status': item.get('orderStatus', ''),
-                                                    'order_amount': item.get('orderAmount', ''),
-                                                    'create_time': item.get('createTime', ''),
-                                                    'settlement_status': item.get('settlementStatus', ''),
-                                                    'settlement_amount': item.get('settlementAmount', ''),
-                                                    'settlement_time': item.get('settlementTime', ''),
-                                                    'country_code': item.get('countryCode', ''),
-                                                    'merchant_id': item.get('merchantId', ''),
-                                                    'pay_id': item.get('payId', ''),
-                                                    'out_order_no': item.get('outOrderNo', ''),
-                                                    'user_mobile_no': item.get('payerAccountNo', '')
-                                                }
-                                                orders.append(order)
-                                            
-                                            return orders, {
-                                                'current': page_number,
-                                                'total': data.get('total', 0),
-                                                'size': data.get('size', self.page_size),
-                                                'pages': data.get('pages', 0)
-                                            }
-                    else:
-                        print(Fore.RED + f"API调用失败: {api_response}")
-                        self.add_log(f"API调用失败: {api_response}", 'red')
-                except Exception as e:
-                    print(Fore.RED + f"解析响应失败: {str(e)}")
-                    self.add_log(f"解析响应失败: {str(e)}", 'red')
-            else:
-                print(Fore.RED + f"API请求失败，状态码: {response.status_code}")
-                self.add_log(f"API请求失败，状态码: {response.status_code}", 'red')
-            
-            # 返回订单列表和空的分页信息
-            return orders, {
-                'current': page_number,
-                'total': 0,
-                'size': self.page_size,
-                'pages': 0
-            }
+            # 每次尝试都重新生成包含签名的请求头（使用POST方法）
+            api_response = self.request_engine.send(
+                'POST', self.order_list_api, params, lambda: self._build_signed_headers(params, method='POST')
+            )
+            if api_response is None:
+                # 返回订单列表和空的分页信息
+                return [], self._empty_pagination(page_number, failed=True)
+            return self._parse_order_list_response(api_response, page_number)
         except Exception as e:
             print(Fore.RED + f"通过API获取订单列表失败: {str(e)}")
             logger.error(f"通过API获取订单列表失败: {str(e)}")
             self.add_log(f"通过API获取订单列表失败: {str(e)}", 'red')
             # 返回订单列表和空的分页信息
-            return [], {
-                'current': page_number,
-                'total': 0,
-                'size': self.page_size,
-                'pages': 0
-            }
+            return [], self._empty_pagination(page_number, failed=True)
 
     def get_order_detail_from_api(self, order_no, order_type):
         """通过API直接获取订单详情"""
         
         try:
-            # 检查认证信息是否有效
-            if not self.is_auth_valid():
-                # 检查是否跳过浏览器操作
-                if hasattr(self.browser_manager, 'skip_browser') and self.browser_manager.skip_browser:
-                    auth_info = self.browser_manager.get_auth_info()
-                    if auth_info and (auth_info.get('token') or auth_info.get('pp_token')):
-                        self.update_auth_info(auth_info)
-                    else:
-                        print(Fore.RED + "配置文件中的认证信息不完整，请检查config.json文件")
-                        self.add_log("配置文件中的认证信息不完整，请检查config.json文件", 'red')
-                        return None
-                else:
-                    # 检查self.page是否为None，如果是，则重新初始化
-                    if not self.page:
-                        self.page = self.browser_manager.page
-                        if not self.page:
-                            print(Fore.RED + "无法获取浏览器页面，请先登录")
-                            self.add_log("无法获取浏览器页面，请先登录", 'red')
-                            return None
-                    
-                    # 从browser_thread的共享变量中获取认证信息
-                    browser_auth_info = None
-                    if hasattr(self, 'browser_thread') and self.browser_thread:
-                        # 添加操作到browser_thread的队列，让它更新认证信息
-                        self.browser_thread.add_operation({
-                            'type': 'get_auth_info',
-                            'callback': None  # 不需要回调，直接从共享变量读取
-                        })
-                        
-                        # 等待一段时间让browser_thread执行操作并更新共享变量
-                        time.sleep(3)  # 等待3秒让browser_thread执行操作
-                        
-                        # 从共享变量中读取认证信息
-                        with self.browser_thread.auth_info_lock:
-                            browser_auth_info = self.browser_thread.shared_auth_info
-                    
-                    if browser_auth_info and (browser_auth_info.get('token') or browser_auth_info.get('pp_token')):
-                        self.update_auth_info(browser_auth_info)
-                    else:
-                        print(Fore.RED + "无法从浏览器获取认证信息，请先登录")
-                        self.add_log("无法从浏览器获取认证信息，请先登录", 'red')
-                        return None
+            cached = self._get_cached_detail(order_no, order_type)
+            if cached is not None:
+                return cached
             
-            # 获取认证信息
-            token = self.auth_info.get('token', '') or self.auth_info.get('pp_token', '')
-            device_id = self.auth_info.get('deviceId', '') or self.auth_info.get('pp_device_id', '')
-            merchantid = self.auth_info.get('merchantid', '') or self.auth_info.get('merchantId', '')
-            country_code = 'gsa'  # 使用'gsa'，与订单列表API一致
+            # 检查认证信息是否有效
+            if not self._ensure_auth_info():
+                return None
             
             # 构造请求参数
-            params = {
-                'orderNo': order_no,
-                'orderType': order_type,
-                'dataSource': 'lindorm',  # 添加dataSource参数
-                'timestamp': int(time.time() * 1000)
-            }
-            
-            # 生成包含签名的请求头（使用GET方法）
-            headers = generate_signature_headers(token, device_id, country_code, params, method='GET', merchantid=merchantid)
-            
-            # 替换sec-ch-ua为与curl一致的值
-            headers['sec-ch-ua'] = '"Chromium";v="143", "Not A(Brand";v="24"'
-            # 替换user-agent为与curl一致的值
-            headers['user-agent'] = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36'
-            
-            # 实现带重试机制的API请求，处理服务器繁忙错误
-            retry_count = 0
-            max_retries = 5
-            base_delay = 0.1  # 基础延迟时间（秒）
-            
-            while retry_count < max_retries:
-                try:
-                    # 添加指数退避延迟
-                    delay = base_delay * (2 ** retry_count)
-                    if delay > 1:
-                        time.sleep(delay)
-                    else:
-                        # 延迟小于1秒时不打印日志，直接休眠
-                        time.sleep(delay)
-                    
-                    # 发起API请求（使用GET方法，参数放在URL中）
-                    response = requests.get(
-                        self.order_detail_api,
-                        params=params,
-                        headers=headers,
-                        timeout=30
-                    )
-                    
-                    # 如果请求成功，跳出重试循环
-                    if response.status_code == 200:
-                        break
-                    
-                    # 如果服务器返回503（服务不可用）或429（请求过多），继续重试
-                    if response.status_code in [503, 429]:
-                        retry_count += 1
-                        continue
-                    
-                    # 其他错误状态码，直接跳出重试循环
-                    break
-                    
-                except requests.exceptions.RequestException as e:
-                    retry_count += 1
-                    if retry_count >= max_retries:
-                        print(Fore.RED + f"请求失败，已达到最大重试次数")
-                        self.add_log("请求失败，已达到最大重试次数", 'red')
-                        return None
+            params = self._build_order_detail_params(order_no, order_type)
             
-            if response.status_code == 200:
-                api_response = response.json()
-                
-                if api_response and 'error' not in api_response:
-                    # 解析API响应
-                    if api_response.get('respCode') == '00000000':
-                        detail_data = self.parse_detail_data(api_response)
-                        return detail_data
-                    else:
-                        error_message = api_response.get('respMsg', 'Unknown error')
-                        print(Fore.RED + f"API返回错误: {error_message}")
-                        self.add_log(f"API返回错误: {error_message}", 'red')
-                        
-                        # 处理token过期错误
-                        if 'token time out' in error_message or 'token expired' in error_message:
-                            # 从browser_thread的共享变量中获取认证信息
-                            browser_auth_info = None
-                            if hasattr(self, 'browser_thread') and self.browser_thread:
-                                # 添加操作到browser_thread的队列，让它更新认证信息
-                                self.browser_thread.add_operation({
-                                    'type': 'get_auth_info',
-                                    'callback': None  # 不需要回调，直接从共享变量读取
-                                })
-                                
-                                # 等待一段时间让browser_thread执行操作并更新共享变量
-                                time.sleep(3)  # 等待3秒让browser_thread执行操作
-                                
-                                # 从共享变量中读取认证信息
-                                with self.browser_thread.auth_info_lock:
-                                    browser_auth_info = self.browser_thread.shared_auth_info
-                            
-                            if browser_auth_info and (browser_auth_info.get('token') or browser_auth_info.get('pp_token')):
-                                self.update_auth_info(browser_auth_info)
-                                
-                                # 重新生成请求头
-                                token = self.auth_info.get('token', '') or self.auth_info.get('pp_token', '')
-                                device_id = self.auth_info.get('deviceId', '') or self.auth_info.get('pp_device_id', '')
-                                merchantid = self.auth_info.get('merchantid', '') or self.auth_info.get('merchantId', '')
-                                headers = generate_signature_headers(token, device_id, country_code, params, method='GET', merchantid=merchantid)
-                                
-                                # 替换sec-ch-ua为与curl一致的值
-                                headers['sec-ch-ua'] = '"Chromium";v="143", "Not A(Brand";v="24"'
-                                # 替换user-agent为与curl一致的值
-                                headers['user-agent'] = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36'
-                                
-                                # 重新发起API请求
-                                time.sleep(self.request_delay)
-                                
-                                response = requests.get(
-                                    self.order_detail_api,
-                                    params=params,
-                                    headers=headers,
-                                    timeout=30
-                                )
-                                
-                                if response.status_code == 200:
-                                    new_api_response = response.json()
-                                    
-                                    if new_api_response.get('respCode') == '00000000':
-                                        detail_data = self.parse_detail_data(new_api_response)
-                                        return detail_data
-                        return None
-                else:
-                    print(Fore.RED + f"API调用失败: {api_response}")
-                    self.add_log(f"API调用失败: {api_response}", 'red')
-                    return None
-            else:
-                print(Fore.RED + f"API请求失败，状态码: {response.status_code}")
-                self.add_log(f"API请求失败，状态码: {response.status_code}", 'red')
+            # 每次尝试都重新生成包含签名的请求头（使用GET方法）
+            api_response = self.request_engine.send(
+                'GET', self.order_detail_api, params, lambda: self._build_detail_headers(params)
+            )
+            if api_response is None:
                 return None
+            detail_data = self.parse_detail_data(api_response)
+            self._cache_detail(order_no, order_type, detail_data)
+            return detail_data
         except Exception as e:
             print(Fore.RED + f"通过API获取订单详情失败: {str(e)}")
             logger.error(f"通过API获取订单详情失败: {str(e)}")
             self.add_log(f"通过API获取订单详情失败: {str(e)}", 'red')
             return None
     
+    def _get_cached_detail(self, order_no, order_type):
+        if self.detail_cache is None:
+            return None
+        # 列表行与上次推送时相同的订单，已过期的缓存详情仍然可用
+        unchanged = order_no in self._unchanged_order_nos
+        try:
+            detail_data = self.detail_cache.get(order_no, order_type, allow_expired=unchanged)
+        except Exception as e:
+            logger.warning(f"读取订单 {order_no} 详情缓存失败: {str(e)}")
+            return None
+        if detail_data is not None:
+            logger.info(f"订单 {order_no} 详情命中本地缓存")
+            if unchanged:
+                with self._order_lock:
+                    self.unchanged_count += 1
+        return detail_data
+
+    def _invalidate_cached_detail(self, order_no, order_type):
+        if self.detail_cache is None:
+            return
+        try:
+            self.detail_cache.invalidate(order_no, order_type)
+        except Exception as e:
+            logger.warning(f"清除订单 {order_no} 详情缓存失败: {str(e)}")
+
+    def _cache_detail(self, order_no, order_type, detail_data):
+        if self.detail_cache is None or not detail_data:
+            return
+        try:
+            self.detail_cache.put(order_no, order_type, detail_data)
+        except Exception as e:
+            logger.warning(f"写入订单 {order_no} 详情缓存失败: {str(e)}")
+
     def parse_detail_data(self, detail_response):
-        """解析订单详情数据，提取所有key-value对"""
-        parsed_data = {}
-        other_info_values = []
-        
-        if not detail_response or detail_response.get('respCode') != '00000000':
-            return parsed_data
-        
-        data_list = detail_response.get('data', [])
-        
-        # 遍历所有信息块
-        for info_block in data_list:
-            block_key = info_block.get('key', '')
-            block_title = info_block.get('title', '')
-            value_list = info_block.get('value', [])
-            
-            # 遍历信息块中的所有字段
-            for field in value_list:
-                field_key = field.get('key', '')
-                field_title = field.get('title', '')
-                field_value = field.get('value', '')
-                value_type = field.get('valueType', '')
-                
-                # 构建字段名：使用title作为列名
-                if field_title:
-                    column_name = f"{block_title}_{field_title}" if block_title else field_title
-                else:
-                    column_name = field_key if field_key else f"{block_key}_field"
-                
-                # 处理不同类型的值
-                if value_type == 'date' and field_value:
-                    # 时间戳转换为可读格式（使用西非时间UTC+1）
-                    try:
-                        import datetime
-                        if isinstance(field_value, (int, float)):
-                            timestamp = field_value / 1000 if field_value > 1000000000000 else field_value
-                            # 使用西非时间（UTC+1）
-                            wat_tz = datetime.timezone(datetime.timedelta(hours=1))
-                            field_value = datetime.datetime.fromtimestamp(timestamp, wat_tz).strftime('%Y-%m-%d %H:%M:%S')
-                    except:
-                        pass
-                
-                # 存储到解析后的数据中
-                parsed_data[column_name] = field_value
-                
-                # 特别处理User Mobile No，确保它存储到与列表中相同的列
-                if field_title == 'User Mobile No':
-                    parsed_data['user_mobile_no'] = field_value
-                
-                # 收集Other Information块中的所有值
-                if block_title == 'Other Information' and field_value:
-                    other_info_values.append(field_value)
-        
-        # 如果没有找到User Mobile No，将Other Information中的所有值合并后填到user_mobile_no
-        if 'user_mobile_no' not in parsed_data and other_info_values:
-            parsed_data['user_mobile_no'] = ' | '.join(other_info_values)
-        
-        return parsed_data
+        """解析订单详情数据，提取所有key-value对（字段结构缓存在detail_parser中）"""
+        return self.detail_parser.parse(detail_response)
     
     def get_order_list_from_website(self, page_number=1, page_size=20):
         """通过调用网站原始的订单列表请求函数获取订单列表"""
@@ -1273,18 +1139,81 @@ class APICrawler:
             self.add_log(f"分析JS文件失败: {str(e)}", 'red')
             return None
     
-    @ErrorHandler.handle_exception
     def crawl_orders_by_api(self, start_timestamp=None, end_timestamp=None, settlement_status=None, stop_event=None):
-        """通过API爬取订单数据"""
+        """通过API爬取订单数据，返回全部订单列表（订单量很大时请使用iter_orders_by_api，避免列表占用内存）
+
+        窗口规划失败等错误直接抛出（如WindowPlanError），调用方可以区分爬取失败和没有订单。
+        """
+        self.order_data = []
+        self._order_sink = self.order_data.append
+        try:
+            self._crawl(start_timestamp, end_timestamp, settlement_status, stop_event)
+        finally:
+            self._order_sink = None
+            self._stop_auth_scheduler()
+        return self.order_data
+
+    def iter_orders_by_api(self, start_timestamp=None, end_timestamp=None, settlement_status=None, stop_event=None, buffer_size=None):
+        """流式爬取：订单写入存储后逐个产出，内存中只保留计数和有界缓冲队列
+
+        爬取在后台线程中进行，调用方消费慢时缓冲队列写满会阻塞存储写入线程，形成背压；
+        调用方提前结束迭代（break或close）时停止爬取，并等待已投递的订单处理完毕。
+        """
+        buffer = queue.Queue(maxsize=max(1, int(buffer_size or self.storage_queue_size)))
+        finished = object()
+        consumer_gone = threading.Event()
+        errors = []
+
+        def sink(order):
+            while not consumer_gone.is_set():
+                try:
+                    buffer.put(order, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+
+        def run():
+            try:
+                self._crawl(start_timestamp, end_timestamp, settlement_status, stop_event)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                self._order_sink = None
+                self._stop_auth_scheduler()
+                buffer.put(finished)
+
+        self.order_data = []
+        self._order_sink = sink
+        crawl_thread = threading.Thread(target=run, name='api-crawl-stream', daemon=True)
+        crawl_thread.start()
+        try:
+            while True:
+                order = buffer.get()
+                if order is finished:
+                    break
+                yield order
+        finally:
+            if crawl_thread.is_alive():
+                # 调用方提前结束：停止爬取，丢弃缓冲中的订单直到爬取线程退出
+                consumer_gone.set()
+                self.is_running = False
+                while buffer.get() is not finished:
+                    pass
+            crawl_thread.join()
+        if errors:
+            raise errors[0]
+
+    def _crawl(self, start_timestamp=None, end_timestamp=None, settlement_status=None, stop_event=None):
         logger.info("开始通过API爬取订单数据")
         print(Fore.CYAN + "开始通过API爬取订单数据...")
         self.add_log("开始通过API爬取订单数据...", 'cyan')
-        self.order_data = []
         self.is_running = True
-        sink_label = "存储"
+        self._start_auth_scheduler()
+        self.sink_label = "存储"
         if self.storage and hasattr(self.storage, 'get_sink_label'):
-            sink_label = self.storage.get_sink_label()
+            self.sink_label = self.storage.get_sink_label()
 
+        account_id = 'unknown_account'
         if self.storage and hasattr(self.storage, 'resolve_account_info'):
             account_info = self.storage.resolve_account_info(self.auth_info)
             account_id = account_info.get('account_id', 'unknown_account')
@@ -1292,18 +1221,332 @@ class APICrawler:
             print(Fore.CYAN + f"当前写入账号: {account_id}")
             self.add_log(f"当前写入账号: {account_id}", 'info')
 
-        if self.storage and hasattr(self.storage, 'start_csv_session'):
-            csv_file_path = self.storage.start_csv_session(auth_info=self.auth_info, force_new=True)
-            if csv_file_path:
-                logger.info(f"本次爬取CSV文件: {csv_file_path}")
-                print(Fore.CYAN + f"本次爬取CSV文件: {csv_file_path}")
-                self.add_log(f"本次爬取CSV文件: {csv_file_path}", 'info')
+        if self.storage and hasattr(self.storage, 'start_spool_session'):
+            spool_path = self.storage.start_spool_session(auth_info=self.auth_info, force_new=True)
+            if spool_path:
+                logger.info(f"本次爬取数据文件: {spool_path}")
+                print(Fore.CYAN + f"本次爬取数据文件: {spool_path}")
+                self.add_log(f"本次爬取数据文件: {spool_path}", 'info')
         
-        # 页面翻页爬取
-        page_number = 1
-        processed_count = 0
-        # 保存订单总数
+        # 已处理订单数、各时间窗口的订单总数（保存订单总数）、已写入的订单号（用于跨窗口去重）
+        self.processed_count = 0
         self.total_orders = 0
+        self._window_totals = {}
+        # 列表页获取失败、未爬取完整的时间窗口
+        self._failed_windows = set()
+        self._seen_order_nos = set()
+        self._order_lock = threading.Lock()
+        self._stop_event = stop_event
+        # 指纹未变化而跳过的订单数；已获取详情、等待写入后保存的指纹
+        self.unchanged_count = 0
+        self._unchanged_order_nos = set()
+        self._pending_fingerprints = {}
+        self._register_delivery_listener()
+        # 已从列表获取的订单数及其中最新的createTime，用于推进增量水位
+        self.account_id = account_id
+        self._listed_count = 0
+        self._max_create_time = None
+
+        if self.crawl_mode == 'incremental':
+            start_timestamp, end_timestamp = self._resolve_incremental_range(account_id, start_timestamp, end_timestamp)
+
+        windows = [(start_timestamp, end_timestamp)]
+        plan_error = None
+        self.last_crawl_plan = None
+        self._window_planner = None
+        self._checkpoint = self._open_checkpoint(account_id, start_timestamp, end_timestamp, settlement_status)
+        if self._checkpoint is not None and self._checkpoint.resumed:
+            windows = list(self._checkpoint.windows)
+            # 中断前已完成的页不会再次列出，把它们的列表订单数、最新createTime和窗口总数计入本次，保证续爬完成后能推进水位
+            self._listed_count, self._max_create_time, window_totals = self._checkpoint.completed_listing()
+            self._window_totals.update(window_totals)
+            self.total_orders = sum(self._window_totals.values())
+            logger.info(f"从检查点继续爬取: {len(windows)} 个时间窗口，已写入 {len(self._checkpoint.stored_order_nos)} 个订单")
+            print(Fore.CYAN + f"从检查点继续爬取: {len(windows)} 个时间窗口，已写入 {len(self._checkpoint.stored_order_nos)} 个订单")
+            self.add_log(f"从检查点继续爬取，已写入 {len(self._checkpoint.stored_order_nos)} 个订单", 'cyan')
+        elif self.max_pages_per_window > 0 and start_timestamp is not None and end_timestamp is not None:
+            try:
+                plan = self.plan_crawl_windows(start_timestamp, end_timestamp, settlement_status=settlement_status, stop_event=stop_event)
+            except WindowPlanError as e:
+                # 探测失败的时间窗口不能当作没有订单跳过：不爬取、不保存检查点，清理后以失败结束
+                plan_error = e
+                plan = {'windows': [], 'total_orders': 0}
+                self._checkpoint = None
+                logger.error(f"爬取窗口规划失败，本次爬取中止: {str(e)}")
+                print(Fore.RED + f"爬取窗口规划失败，本次爬取中止: {str(e)}")
+                self.add_log(f"爬取窗口规划失败，本次爬取中止: {str(e)}", 'red')
+            plan_interrupted = plan.get('interrupted', False)
+            if plan_interrupted:
+                # 规划被停止信号中断：窗口列表不完整，不能当作完整计划爬取，也不能写入检查点
+                # （否则续爬时只会爬取这几个窗口，并把检查点当作全部完成删除）
+                plan = {'windows': [], 'total_orders': 0}
+                self._checkpoint = None
+            windows = [(window['start'], window['end']) for window in plan['windows']]
+            for window in plan['windows']:
+                self._window_totals[(window['start'], window['end'])] = window['total']
+            self.total_orders = plan['total_orders']
+            if not windows and plan_error is None and not plan_interrupted:
+                logger.warning("没有找到订单，爬取结束")
+                print(Fore.RED + "没有找到订单，爬取结束")
+                self.add_log("没有找到订单，爬取结束", 'red')
+        elif self.crawl_window_shards > 1 and start_timestamp is not None and end_timestamp is not None:
+            windows = self._split_time_windows(start_timestamp, end_timestamp, self.crawl_window_shards)
+
+        if self._checkpoint is not None:
+            self._checkpoint.start(windows)
+
+        try:
+            self._run_windows(windows, settlement_status, stop_event)
+        finally:
+            self._close_checkpoint(stop_event)
+            if self.storage and hasattr(self.storage, 'flush_pending'):
+                flush_ok = self.storage.flush_pending(auth_info=self.auth_info)
+                if flush_ok:
+                    self.add_log("已完成数据文件到接口推送(最终flush)", 'green')
+                else:
+                    self.add_log("数据文件到接口推送失败(最终flush)，请检查接口状态", 'yellow')
+            self._unregister_delivery_listener()
+            if self.detail_cache is not None:
+                self.detail_cache.flush()
+
+        if plan_error is not None:
+            raise plan_error
+
+        self._advance_watermark(account_id, stop_event)
+
+        processed_count = self.processed_count
+        if self.unchanged_count:
+            logger.info(f"共有 {self.unchanged_count} 个订单与上次推送时相比没有变化，已使用本地缓存的详情")
+            print(Fore.CYAN + f"共有 {self.unchanged_count} 个订单与上次推送时相比没有变化，已使用本地缓存的详情")
+            self.add_log(f"共有 {self.unchanged_count} 个订单与上次推送时相比没有变化，已使用本地缓存的详情", 'cyan')
+        logger.info(f"API爬取完成，共处理 {processed_count} 个订单")
+        print(Fore.GREEN + f"API爬取完成，共处理 {processed_count} 个订单")
+        self.add_log(f"API爬取完成，共处理 {processed_count} 个订单", 'green')
+        self.request_engine.log_stats()
+        if self.detail_cache is not None:
+            self.detail_cache.log_stats()
+        self._log_transport_stats()
+        self._log_push_stats()
+        
+        # 输出保存完毕的日志
+        logger.info("保存完毕，爬虫停止")
+        print(Fore.GREEN + "保存完毕，爬虫停止")
+        self.add_log("保存完毕，爬虫停止", 'green')
+        return processed_count
+
+    def _run_windows(self, windows, settlement_status=None, stop_event=None):
+        """通过分阶段流水线爬取所有时间窗口"""
+        if not windows:
+            return
+        # 分阶段流水线：列表页只负责投递订单，详情返回后立即交给存储写入线程
+        self._pipeline = CrawlPipeline(
+            self._fetch_order_detail,
+            self._write_crawled_order,
+            detail_workers=self.detail_concurrency.max_limit,
+            detail_queue_size=self.detail_queue_size,
+            storage_queue_size=self.storage_queue_size,
+        ).start()
+        try:
+            if len(windows) == 1:
+                self._crawl_window(windows[0][0], windows[0][1], settlement_status, stop_event)
+            else:
+                max_workers = min(self.crawl_shard_workers, len(windows))
+                logger.info(f"时间窗口分片爬取: 共 {len(windows)} 个窗口，{max_workers} 个并行worker")
+                print(Fore.CYAN + f"时间窗口分片爬取: 共 {len(windows)} 个窗口，{max_workers} 个并行worker")
+                self.add_log(f"时间窗口分片爬取: 共 {len(windows)} 个窗口，{max_workers} 个并行worker", 'cyan')
+                with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    future_to_window = {}
+                    for index, (window_start, window_end) in enumerate(windows, 1):
+                        window_label = f"[窗口 {index}/{len(windows)}] "
+                        future = executor.submit(self._crawl_window, window_start, window_end, settlement_status, stop_event, window_label)
+                        future_to_window[future] = window_label
+                    for future in concurrent.futures.as_completed(future_to_window):
+                        try:
+                            future.result()
+                        except Exception as e:
+                            window_label = future_to_window[future]
+                            print(Fore.RED + f"{window_label}爬取时间窗口失败: {str(e)}")
+                            logger.error(f"{window_label}爬取时间窗口失败: {str(e)}")
+                            self.add_log(f"{window_label}爬取时间窗口失败: {str(e)}", 'red')
+            # 等待已投递的订单全部完成详情获取并写入存储
+            if self._should_stop(stop_event):
+                self._pipeline.cancel_pending()
+            self._pipeline.join()
+        finally:
+            if self._should_stop(stop_event):
+                self._pipeline.cancel_pending()
+            self._pipeline.shutdown()
+            self._log_pipeline_stats()
+
+    def plan_crawl_windows(self, start_timestamp, end_timestamp, settlement_status=None, stop_event=None):
+        """在爬取开始前生成窗口规划，返回窗口列表、预计页数和预计请求数"""
+        planner = CrawlWindowPlanner(
+            self,
+            self.max_pages_per_window or 50,
+            max_workers=self.crawl_shard_workers,
+        )
+        print(Fore.CYAN + "正在根据订单总数规划时间窗口...")
+        logger.info("正在根据订单总数规划时间窗口")
+        self.add_log("正在根据订单总数规划时间窗口...", 'cyan')
+        plan = planner.plan(start_timestamp, end_timestamp, settlement_status=settlement_status, stop_event=stop_event)
+        planner.log_plan(plan, add_log=self.add_log)
+        self._window_planner = planner
+        self.last_crawl_plan = plan
+        return plan
+
+    def _open_checkpoint(self, account_id, start_timestamp, end_timestamp, settlement_status):
+        """按账号、时间范围和结算状态打开检查点，存在未完成的检查点时加载它
+
+        增量模式的结束时间是每次爬取时的当前时间，不能作为标识，改用起始时间（由水位决定，
+        只有完整爬取结束后才推进）标识，中断后再次增量爬取时继续同一个检查点，不会留下无法续爬的检查点。
+        """
+        if not self.checkpoint_enabled:
+            return None
+        if self.crawl_mode == 'incremental':
+            key = crawl_checkpoint_key(account_id, 'incremental', start_timestamp, settlement_status)
+        else:
+            key = crawl_checkpoint_key(account_id, start_timestamp, end_timestamp, settlement_status)
+        try:
+            checkpoint = CrawlCheckpoint(self.checkpoint_dir, key)
+            checkpoint.load()
+            return checkpoint
+        except Exception as e:
+            logger.warning(f"打开爬取检查点失败，本次不记录检查点: {str(e)}")
+            return None
+
+    def _close_checkpoint(self, stop_event=None):
+        """所有窗口都完整爬取时删除检查点，否则保留以便下次续爬"""
+        checkpoint = self._checkpoint
+        if checkpoint is None:
+            return
+        self._checkpoint = None
+        if not self._should_stop(stop_event) and checkpoint.all_windows_done():
+            checkpoint.clear()
+            return
+        checkpoint.close()
+        logger.info(f"爬取未完整结束，已保留检查点: {checkpoint.header_path}")
+        print(Fore.YELLOW + "爬取未完整结束，已保留检查点，下次以相同参数爬取时将从中断处继续")
+        self.add_log("爬取未完整结束，已保留检查点，下次以相同参数爬取时将从中断处继续", 'yellow')
+
+    def _window_start_page(self, window_key, window_label=''):
+        """窗口的起始页码：有检查点时从检查点页码开始，已完成的窗口返回None"""
+        if self._checkpoint is None:
+            return 1
+        if self._checkpoint.is_window_done(window_key):
+            logger.info(f"{window_label}检查点显示该窗口已完成，跳过")
+            return None
+        page_number = self._checkpoint.start_page(window_key)
+        if page_number > 1:
+            logger.info(f"{window_label}从检查点第 {page_number} 页继续爬取")
+            print(Fore.CYAN + f"{window_label}从检查点第 {page_number} 页继续爬取")
+            self.add_log(f"{window_label}从检查点第 {page_number} 页继续爬取", 'cyan')
+        return page_number
+
+    def _orders_to_submit(self, window_key, page_number, orders, pagination, window_label=''):
+        """过滤掉检查点中已写入的订单、标记指纹未变化的订单，并把本页待处理订单记入检查点"""
+        listed_count = len(orders)
+        create_times = [order['create_time'] for order in orders if isinstance(order.get('create_time'), (int, float))]
+        if self._checkpoint is not None and self._checkpoint.stored_order_nos:
+            orders = [order for order in orders if order['order_no'] not in self._checkpoint.stored_order_nos]
+        self._mark_unchanged_orders(orders, window_label)
+        if self._checkpoint is not None:
+            self._checkpoint.page_listed(
+                window_key,
+                page_number,
+                [order['order_no'] for order in orders],
+                total=pagination.get('total'),
+                pages=pagination.get('pages'),
+                listed_count=listed_count,
+                max_create_time=int(max(create_times)) if create_times else None,
+            )
+        return orders
+
+    def _list_page_failed(self, window_key, window_label, page_number):
+        """列表页获取失败（不是没有订单）：窗口保持未完成，检查点从该页续爬，本次不推进增量水位"""
+        with self._order_lock:
+            self._failed_windows.add(window_key)
+        logger.error(f"{window_label}第 {page_number} 页列表获取失败，该时间窗口未爬取完整，下次爬取时从该页继续")
+        print(Fore.RED + f"{window_label}第 {page_number} 页列表获取失败，该时间窗口未爬取完整，下次爬取时从该页继续")
+        self.add_log(f"{window_label}第 {page_number} 页列表获取失败，该时间窗口未爬取完整", 'red')
+
+    def _checkpoint_page_empty(self, window_key, page_number):
+        if self._checkpoint is not None:
+            self._checkpoint.page_empty(window_key, page_number)
+
+    def _checkpoint_window_finished(self, window_key, last_page):
+        if self._checkpoint is not None:
+            self._checkpoint.window_listing_finished(window_key, last_page)
+
+    def _resolve_incremental_range(self, account_id, start_timestamp, end_timestamp):
+        """增量模式：从该账号的水位减去重叠时间开始爬到当前时间；没有水位时使用传入的时间范围"""
+        watermark = self.watermark_store.get(account_id)
+        if watermark is None:
+            logger.info(f"账号 {account_id} 还没有增量爬取水位，本次按选择的时间范围爬取")
+            print(Fore.CYAN + f"账号 {account_id} 还没有增量爬取水位，本次按选择的时间范围爬取")
+            self.add_log(f"账号 {account_id} 还没有增量爬取水位，本次按选择的时间范围爬取", 'cyan')
+            return start_timestamp, end_timestamp
+        start_timestamp = max(0, watermark - self.incremental_overlap_ms)
+        end_timestamp = int(time.time() * 1000)
+        logger.info(f"增量爬取: 账号 {account_id} 水位 {watermark}，从 {start_timestamp} 爬取到 {end_timestamp}")
+        print(Fore.CYAN + f"增量爬取: 账号 {account_id} 水位 {watermark}，从 {start_timestamp} 爬取到 {end_timestamp}")
+        self.add_log(f"增量爬取: 从 {start_timestamp} 爬取到 {end_timestamp}（重叠 {self.incremental_overlap_ms // 1000} 秒）", 'cyan')
+        return start_timestamp, end_timestamp
+
+    def _advance_watermark(self, account_id, stop_event=None):
+        """本次爬取完整结束（未停止、列表订单全部取到）时，把水位推进到已写入订单中最新的createTime"""
+        if self._max_create_time is None or self._should_stop(stop_event):
+            return
+        if self._failed_windows:
+            logger.warning(f"有 {len(self._failed_windows)} 个时间窗口的列表获取失败，本次不推进增量水位")
+            return
+        if self.total_orders and self._listed_count < self.total_orders:
+            logger.warning(f"列表只获取到 {self._listed_count} / {self.total_orders} 个订单，本次不推进增量水位")
+            return
+        try:
+            watermark = self.watermark_store.update(account_id, self._max_create_time)
+            logger.info(f"账号 {account_id} 增量爬取水位更新为 {watermark}")
+        except Exception as e:
+            logger.warning(f"保存增量爬取水位失败: {str(e)}")
+
+    def _split_time_windows(self, start_timestamp, end_timestamp, shard_count):
+        """将[start, end]毫秒时间范围均分为shard_count个互不重叠的子窗口"""
+        start_timestamp = int(start_timestamp)
+        end_timestamp = int(end_timestamp)
+        if end_timestamp <= start_timestamp or shard_count <= 1:
+            return [(start_timestamp, end_timestamp)]
+
+        step = math.ceil((end_timestamp - start_timestamp + 1) / shard_count)
+        windows = []
+        window_start = start_timestamp
+        while window_start <= end_timestamp:
+            window_end = min(window_start + step - 1, end_timestamp)
+            windows.append((window_start, window_end))
+            window_start = window_end + 1
+        return windows
+
+    def _should_stop(self, stop_event=None):
+        return not self.is_running or (stop_event is not None and stop_event.is_set())
+
+    def _crawl_window(self, start_timestamp, end_timestamp, settlement_status=None, stop_event=None, window_label=''):
+        """翻页爬取单个时间窗口内的订单"""
+        window_key = (start_timestamp, end_timestamp)
+        page_number = self._window_start_page(window_key, window_label)
+        if page_number is None:
+            return
+        # 窗口规划阶段已获取的第1页结果，直接复用
+        first_page = None
+        if self._window_planner is not None:
+            first_page = self._window_planner.take_first_page(start_timestamp, end_timestamp)
+
+        def fetch_list_page(number):
+            return self.get_order_list_from_api(start_timestamp, end_timestamp, page_number=number, page_size=self.page_size, settlement_status=settlement_status)
+
+        # 列表页预取：页码 -> Future
+        prefetched_pages = {}
+        list_executor = None
+        if self.list_prefetch_depth > 0:
+            list_executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.list_prefetch_depth)
+            logger.info(f"{window_label}已启用列表页预取，预取深度: {self.list_prefetch_depth}")
         try:
             while self.is_running:
                 # 检查是否收到停止信号
@@ -1313,85 +1556,71 @@ class APICrawler:
                     self.add_log("收到停止信号，停止爬取", 'yellow')
                     break
                 
-                print(Fore.CYAN + f"处理第 {page_number} 页...")
-                logger.info(f"处理第 {page_number} 页")
-                self.add_log(f"处理第 {page_number} 页...", 'cyan')
+                print(Fore.CYAN + f"{window_label}处理第 {page_number} 页...")
+                logger.info(f"{window_label}处理第 {page_number} 页")
+                self.add_log(f"{window_label}处理第 {page_number} 页...", 'cyan')
                 
-                # 通过API获取订单列表
-                orders, pagination = self.get_order_list_from_api(start_timestamp, end_timestamp, page_number=page_number, page_size=self.page_size, settlement_status=settlement_status)
+                # 通过API获取订单列表（优先使用已预取的结果）
+                future = prefetched_pages.pop(page_number, None)
+                if page_number == 1 and first_page is not None:
+                    orders, pagination = first_page
+                elif future is not None:
+                    try:
+                        orders, pagination = future.result()
+                    except Exception as e:
+                        logger.error(f"{window_label}预取第 {page_number} 页失败: {str(e)}")
+                        orders, pagination = [], self._empty_pagination(page_number, failed=True)
+                else:
+                    orders, pagination = fetch_list_page(page_number)
                 
+                if pagination.get('failed'):
+                    self._list_page_failed(window_key, window_label, page_number)
+                    break
                 if not orders:
+                    self._checkpoint_page_empty(window_key, page_number)
                     if page_number == 1:
-                        logger.warning("没有找到订单，爬取结束")
-                        print(Fore.RED + "没有找到订单，爬取结束")
-                        self.add_log("没有找到订单，爬取结束", 'red')
+                        logger.warning(f"{window_label}没有找到订单，爬取结束")
+                        print(Fore.RED + f"{window_label}没有找到订单，爬取结束")
+                        self.add_log(f"{window_label}没有找到订单，爬取结束", 'red')
                     else:
-                        logger.info("已获取所有订单，爬取完成")
-                        print(Fore.GREEN + "已获取所有订单，爬取完成")
-                        self.add_log("已获取所有订单，爬取完成", 'green')
+                        logger.info(f"{window_label}已获取所有订单，爬取完成")
+                        print(Fore.GREEN + f"{window_label}已获取所有订单，爬取完成")
+                        self.add_log(f"{window_label}已获取所有订单，爬取完成", 'green')
                     break
                 
                 # 检查是否已经到达最后一页
-                current_page = pagination.get('current', page_number)
-                total_pages = pagination.get('pages', 0)
-                total_orders = pagination.get('total', 0)
+                current_page, total_pages = self._record_page_progress(window_key, window_label, page_number, orders, pagination)
                 
-                # ✅ 兜底：如果接口没给 pages，就用 total/page_size 自己算
-                if (not total_pages or total_pages <= 0) and total_orders and self.page_size:
-                    total_pages = math.ceil(total_orders / int(self.page_size))
-                    pagination['pages'] = total_pages  # 可选：写回去方便后续使用
-                # 打印分页信息（更加醒目）
-                print(Fore.CYAN + "=" * 60)
-                print(Fore.CYAN + f"【爬取进度】当前页: {current_page} | 总页数: {total_pages} | 总条数: {total_orders}")
-                print(Fore.CYAN + "=" * 60)
-                logger.info(f"当前页: {current_page}, 总页数: {total_pages}, 总条数: {total_orders}")
-                self.add_log(f"【爬取进度】第 {current_page}/{total_pages} 页，共 {total_orders} 条订单", 'cyan')
-                
-                # 保存订单总数
-                if total_orders > 0:
-                    self.total_orders = total_orders
-                else:
-                    # 如果API返回的total为0，累加当前页的订单数
-                    self.total_orders += len(orders)
+                # 在获取当前页详情之前，提交后续页的列表预取
+                if list_executor is not None:
+                    last_prefetch_page = page_number + self.list_prefetch_depth
+                    if total_pages > 0:
+                        last_prefetch_page = min(last_prefetch_page, total_pages)
+                    for next_page in range(page_number + 1, last_prefetch_page + 1):
+                        if next_page not in prefetched_pages:
+                            prefetched_pages[next_page] = list_executor.submit(fetch_list_page, next_page)
                 
-                # 批量获取订单详情
-                batch_orders = self.get_order_details_batch(orders)
-                
-                # 处理获取到的订单详情
-                for order in batch_orders:
+                # 投递到流水线，详情队列满时阻塞（背压）
+                for order in self._orders_to_submit(window_key, page_number, orders, pagination, window_label):
                     # 检查是否应该停止
-                    if not self.is_running or (stop_event and stop_event.is_set()):
+                    if self._should_stop(stop_event):
                         logger.info("收到停止信号，停止爬取")
                         print(Fore.YELLOW + "收到停止信号，停止爬取")
                         self.add_log("收到停止信号，停止爬取", 'yellow')
                         break
-                    
-                    # 添加到总数据
-                    self.order_data.append(order)
-                    processed_count += 1
-                    
-                    # 实时写入当前存储目标（接口或数据库）
-                    if self.storage:
-                        self.storage.append_single_to_db(order, auth_info=self.auth_info)
-                    
-                    # 确保总订单数正确显示
-                    current_total = getattr(self, 'total_orders', total_orders)
-                    # 如果总订单数为0，使用已处理订单数作为临时替代
-                    if current_total == 0:
-                        current_total = processed_count
-                    logger.info(f"已处理 {processed_count} / {current_total}个订单，正在写入第 {processed_count} 条到{sink_label}")
-                    print(Fore.GREEN + f"已处理 {processed_count} / {current_total}个订单，正在写入第 {processed_count} 条到{sink_label}")
-                    self.add_log(f"已处理 {processed_count} / {current_total}个订单，正在写入第 {processed_count} 条到{sink_label}", 'green')
+                    self._pipeline.submit(order)
+                self._log_pipeline_stats(window_label)
                 
                 # 检查是否应该停止
-                if not self.is_running or (stop_event and stop_event.is_set()):
+                if self._should_stop(stop_event):
                     logger.info("收到停止信号，停止翻页")
                     break
                 
                 if current_page >= total_pages and total_pages > 0:
-                    logger.info(f"已到达最后一页（第 {current_page} 页，共 {total_pages} 页），爬取完成")
-                    print(Fore.GREEN + f"已到达最后一页（第 {current_page} 页，共 {total_pages} 页），爬取完成")
-                    self.add_log(f"已到达最后一页（第 {current_page} 页，共 {total_pages} 页），爬取完成", 'green')
+                    self._checkpoint_window_finished(window_key, current_page)
+                    logger.info(f"{window_label}已到达最后一页（第 {current_page} 页，共 {total_pages} 页），爬取完成")
+                    print(Fore.GREEN + f"{window_label}已到达最后一页（第 {current_page} 页，共 {total_pages} 页），爬取完成")
+                    self.add_log(f"{window_label}已到达最后一页（第 {current_page} 页，共 {total_pages} 页），爬取完成", 'green')
                     break
                 
                 page_number += 1
@@ -1399,82 +1628,232 @@ class APICrawler:
                 # 防止请求过快
                 time.sleep(self.request_delay)
         finally:
-            if self.storage and hasattr(self.storage, 'flush_pending'):
-                flush_ok = self.storage.flush_pending(auth_info=self.auth_info)
-                if flush_ok:
-                    self.add_log("已完成CSV到接口推送(最终flush)", 'green')
-                else:
-                    self.add_log("CSV到接口推送失败(最终flush)，请检查接口状态", 'yellow')
+            if list_executor is not None:
+                list_executor.shutdown(wait=False, cancel_futures=True)
 
-        logger.info(f"API爬取完成，共处理 {processed_count} 个订单")
-        print(Fore.GREEN + f"API爬取完成，共处理 {processed_count} 个订单")
-        self.add_log(f"API爬取完成，共处理 {processed_count} 个订单", 'green')
+    def _record_page_progress(self, window_key, window_label, page_number, orders, pagination):
+        """打印分页进度并累计订单总数，返回(当前页, 总页数)"""
+        current_page = pagination.get('current', page_number)
+        total_pages = pagination.get('pages', 0)
+        total_orders = pagination.get('total', 0)
         
-        # 输出保存完毕的日志
-        logger.info("保存完毕，爬虫停止")
-        print(Fore.GREEN + "保存完毕，爬虫停止")
-        self.add_log("保存完毕，爬虫停止", 'green')
+        # ✅ 兜底：如果接口没给 pages，就用 total/page_size 自己算
+        if (not total_pages or total_pages <= 0) and total_orders and self.page_size:
+            total_pages = math.ceil(total_orders / int(self.page_size))
+            pagination['pages'] = total_pages  # 可选：写回去方便后续使用
+        # 打印分页信息（更加醒目）
+        print(Fore.CYAN + "=" * 60)
+        print(Fore.CYAN + f"{window_label}【爬取进度】当前页: {current_page} | 总页数: {total_pages} | 总条数: {total_orders}")
+        print(Fore.CYAN + "=" * 60)
+        logger.info(f"{window_label}当前页: {current_page}, 总页数: {total_pages}, 总条数: {total_orders}")
+        self.add_log(f"{window_label}【爬取进度】第 {current_page}/{total_pages} 页，共 {total_orders} 条订单", 'cyan')
         
-        return self.order_data
+        # 保存订单总数（多个窗口时为各窗口之和）
+        with self._order_lock:
+            self._listed_count += len(orders)
+            for order in orders:
+                create_time = order.get('create_time')
+                if isinstance(create_time, (int, float)) and (self._max_create_time is None or create_time > self._max_create_time):
+                    self._max_create_time = int(create_time)
+            if total_orders > 0:
+                self._window_totals[window_key] = total_orders
+            else:
+                # 如果API返回的total为0，累加当前页的订单数
+                self._window_totals[window_key] = self._window_totals.get(window_key, 0) + len(orders)
+            self.total_orders = sum(self._window_totals.values())
+        return current_page, total_pages
+
+    def _store_crawled_order(self, order):
+        """按order_no去重后，记录订单并实时写入当前存储目标（接口或数据库）"""
+        order = order_to_dict(order)
+        order_no = order.get('order_no', '')
+        with self._order_lock:
+            if order_no and order_no in self._seen_order_nos:
+                logger.info(f"订单 {order_no} 已写入过，跳过重复订单")
+                if self._checkpoint is not None:
+                    self._checkpoint.order_stored(order_no)
+                return False
+            if order_no:
+                self._seen_order_nos.add(order_no)
+            self.processed_count += 1
+            processed_count = self.processed_count
+            # 确保总订单数正确显示，如果总订单数为0，使用已处理订单数作为临时替代
+            current_total = self.total_orders or processed_count
+
+        # 实时写入当前存储目标（接口或数据库）
+        if self.storage:
+            self.storage.append_single_to_db(order, auth_info=self.auth_info)
+        if not self._delivery_listener_registered:
+            # 存储不支持推送确认时（同步写入），写入即视为送达
+            self._on_orders_delivered([order_no])
+        if self._checkpoint is not None:
+            self._checkpoint.order_stored(order_no)
+        # 交给调用方：crawl_orders_by_api收集到列表，iter_orders_by_api放入缓冲队列
+        sink = self._order_sink
+        if sink is not None:
+            sink(order)
+        
+        logger.info(f"已处理 {processed_count} / {current_total}个订单，正在写入第 {processed_count} 条到{self.sink_label}")
+        print(Fore.GREEN + f"已处理 {processed_count} / {current_total}个订单，正在写入第 {processed_count} 条到{self.sink_label}")
+        self.add_log(f"已处理 {processed_count} / {current_total}个订单，正在写入第 {processed_count} 条到{self.sink_label}", 'green')
+        return True
     
-    def get_order_details_batch(self, orders):
-        """批量获取订单详情"""
-        import concurrent.futures
+    def _mark_unchanged_orders(self, orders, window_label=''):
+        """记录列表行指纹与上次推送成功时相同的订单：这些订单优先使用本地缓存的详情（即使已过期），订单仍照常写入"""
+        if self.fingerprint_store is None:
+            return
+        unchanged = 0
+        for order in orders:
+            try:
+                previous = self.fingerprint_store.get(order['order_no'], order.get('order_type', ''))
+            except Exception as e:
+                logger.warning(f"读取订单 {order.get('order_no', '')} 指纹失败: {str(e)}")
+                previous = None
+            if previous is None:
+                continue
+            if previous == order_fingerprint(order):
+                unchanged += 1
+                with self._order_lock:
+                    self._unchanged_order_nos.add(order['order_no'])
+            else:
+                # 状态或金额已变化，本地缓存的详情也随之失效
+                self._invalidate_cached_detail(order['order_no'], order.get('order_type', ''))
+        if unchanged:
+            logger.info(f"{window_label}本页 {unchanged} 个订单与上次推送时相比没有变化，将使用本地缓存的详情")
+
+    def _mark_fingerprint_pending(self, order):
+        """详情获取成功后记录列表行指纹，等订单推送成功后再保存"""
+        if self.fingerprint_store is None:
+            return
+        with self._order_lock:
+            self._pending_fingerprints[order['order_no']] = (order.get('order_type', ''), order_fingerprint(order))
+
+    def _register_delivery_listener(self):
+        """存储支持推送确认时，订单推送成功后才保存指纹"""
+        self._delivery_listener_registered = False
+        if self.fingerprint_store is not None and self.storage and hasattr(self.storage, 'add_delivery_listener'):
+            self.storage.add_delivery_listener(self._on_orders_delivered)
+            self._delivery_listener_registered = True
+
+    def _unregister_delivery_listener(self):
+        if self._delivery_listener_registered:
+            self.storage.remove_delivery_listener(self._on_orders_delivered)
+            self._delivery_listener_registered = False
+
+    def _on_orders_delivered(self, order_nos):
+        """存储确认订单已送达（推送线程中调用），保存这些订单的指纹"""
+        if self.fingerprint_store is None:
+            return
+        with self._order_lock:
+            entries = []
+            for order_no in order_nos:
+                pending = self._pending_fingerprints.pop(order_no, None)
+                if pending is not None:
+                    entries.append((order_no, pending[0], pending[1]))
+        try:
+            self.fingerprint_store.save_many(entries)
+        except Exception as e:
+            logger.warning(f"保存 {len(entries)} 个订单指纹失败: {str(e)}")
+
+    def _fetch_order_detail(self, order):
+        """获取单个订单详情，未获取到时返回订单列表中的基本信息"""
+        order_no = order['order_no']
+        order_type = order['order_type']
         
-        batch_orders = []
+        # 打印订单总数信息
+        if hasattr(self, 'total_orders') and self.total_orders > 0:
+            print(Fore.CYAN + f"通过API获取订单 {order_no} 详情... (订单总数: {self.total_orders})")
+            logger.info(f"通过API获取订单 {order_no} 详情 (订单总数: {self.total_orders})")
+            self.add_log(f"通过API获取订单 {order_no} 详情... (订单总数: {self.total_orders})")
+        else:
+            print(Fore.CYAN + f"通过API获取订单 {order_no} 详情...")
+            logger.info(f"通过API获取订单 {order_no} 详情")
+            self.add_log(f"通过API获取订单 {order_no} 详情...")
         
-        # 定义获取单个订单详情的函数
-        def get_order_detail(order):
-            order_no = order['order_no']
-            order_type = order['order_type']
-            
-            # 打印订单总数信息
-            if hasattr(self, 'total_orders') and self.total_orders > 0:
-                print(Fore.CYAN + f"通过API获取订单 {order_no} 详情... (订单总数: {self.total_orders})")
-                logger.info(f"通过API获取订单 {order_no} 详情 (订单总数: {self.total_orders})")
-                self.add_log(f"通过API获取订单 {order_no} 详情... (订单总数: {self.total_orders})")
-            else:
-                print(Fore.CYAN + f"通过API获取订单 {order_no} 详情...")
-                logger.info(f"通过API获取订单 {order_no} 详情")
-                self.add_log(f"通过API获取订单 {order_no} 详情...")
-            
-            # 通过API获取订单详情
+        # 通过API获取订单详情（同时在途的详情请求数由自适应并发控制器限制）
+        with self.detail_concurrency.slot():
             detail_data = self.get_order_detail_from_api(order_no, order_type)
-            
-            if detail_data:
-                # 只使用订单详情中的信息，不合并订单列表中的信息
-                # 添加订单号到详情数据中，以便识别
-                detail_data['order_no'] = order_no
-                print(Fore.GREEN + f"成功获取订单 {order_no} 详情")
-                logger.info(f"成功获取订单 {order_no} 详情")
-                self.add_log(f"成功获取订单 {order_no} 详情", 'green')
-                return detail_data
-            else:
-                print(Fore.YELLOW + f"未获取到订单 {order_no} 详情数据，使用订单列表中的基本信息")
-                logger.warning(f"未获取到订单 {order_no} 详情数据，使用订单列表中的基本信息")
-                self.add_log(f"未获取到订单 {order_no} 详情数据，使用订单列表中的基本信息", 'yellow')
-                # 未获取到详情时，返回订单列表中的基本信息
-                return order
         
-        # 使用线程池并行获取订单详情
-        max_workers = min(5, len(orders))  # 最多5个线程
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 提交所有订单详情请求
-            future_to_order = {executor.submit(get_order_detail, order): order for order in orders}
-            
-            # 收集结果
-            for future in concurrent.futures.as_completed(future_to_order):
-                try:
-                    order = future.result()
-                    batch_orders.append(order)
-                except Exception as e:
-                    order = future_to_order[future]
-                    print(Fore.RED + f"获取订单 {order['order_no']} 详情时出错: {str(e)}")
-                    logger.error(f"获取订单 {order['order_no']} 详情时出错: {str(e)}")
-                    self.add_log(f"获取订单 {order['order_no']} 详情时出错: {str(e)}", 'red')
-                    batch_orders.append(order)  # 即使出错也添加原始订单数据
-        
-        return batch_orders
+        if detail_data:
+            # 只使用订单详情中的信息，不合并订单列表中的信息
+            # 添加订单号到详情数据中，以便识别
+            detail_data['order_no'] = order_no
+            self._mark_fingerprint_pending(order)
+            print(Fore.GREEN + f"成功获取订单 {order_no} 详情")
+            logger.info(f"成功获取订单 {order_no} 详情")
+            self.add_log(f"成功获取订单 {order_no} 详情", 'green')
+            return detail_data
+        else:
+            print(Fore.YELLOW + f"未获取到订单 {order_no} 详情数据，使用订单列表中的基本信息")
+            logger.warning(f"未获取到订单 {order_no} 详情数据，使用订单列表中的基本信息")
+            self.add_log(f"未获取到订单 {order_no} 详情数据，使用订单列表中的基本信息", 'yellow')
+            # 未获取到详情时，返回订单列表中的基本信息
+            return order
+
+    def _write_crawled_order(self, order):
+        """存储写入线程的回调：收到停止信号后不再写入"""
+        if self._should_stop(self._stop_event):
+            return
+        self._store_crawled_order(order)
+
+    def get_pipeline_stats(self):
+        """返回流水线各阶段队列深度，未在爬取时返回None"""
+        if self._pipeline is None:
+            return None
+        return self._pipeline.queue_depths()
+
+    def _log_pipeline_stats(self, window_label=''):
+        stats = self.get_pipeline_stats()
+        if not stats:
+            return
+        concurrency = self.get_concurrency_stats()
+        logger.info(
+            f"{window_label}[流水线] 详情队列 {stats['detail_queue']}/{stats['detail_queue_max']}，"
+            f"存储队列 {stats['storage_queue']}/{stats['storage_queue_max']}，"
+            f"已投递 {stats['submitted']}，已获取详情 {stats['detailed']}，已写入 {stats['stored']}，"
+            f"详情并发 {concurrency['in_flight']}/{concurrency['limit']}"
+        )
+        if self.storage and hasattr(self.storage, 'get_push_stats'):
+            push = self.storage.get_push_stats()
+            logger.info(
+                f"{window_label}[推送] 推送队列 {push['queue_depth']}/{push['queue_max']}，"
+                f"待推送 {push['outstanding_rows']} 条，推送延迟 {push['push_lag']:.1f}s"
+            )
+
+    def _log_transport_stats(self):
+        self.http.log_stats()
+
+    def _log_push_stats(self):
+        if not (self.storage and hasattr(self.storage, 'get_push_stats')):
+            return
+        stats = self.storage.get_push_stats()
+        summary = (
+            f"[推送] 已推送 {stats['pushed_rows']} 条（{stats['pushed_jobs']} 个批次），"
+            f"失败待重试 {stats['failed_rows']} 条，最近一次推送延迟 {stats['last_latency']:.1f}s"
+        )
+        logger.info(summary)
+        self.add_log(summary, 'cyan')
+
+    def get_concurrency_stats(self):
+        """返回详情请求当前并发上限、在途数及最近的调整记录"""
+        return self.detail_concurrency.snapshot()
+
+    def _on_api_attempt(self, url, elapsed, outcome):
+        """请求引擎每次尝试后的回调：限流信号用于减小详情并发，详情请求的成功延迟用于增加并发"""
+        if outcome == AUTH_EXPIRED:
+            self.auth_scheduler.observe_expiry(auth_token(self.auth_info), requested_at=time.time() - elapsed)
+        elif outcome == RETRY:
+            self.detail_concurrency.on_throttle()
+        elif outcome == OK and url == self.order_detail_api:
+            self.detail_concurrency.on_success(elapsed)
+
+    def _on_concurrency_change(self, decision):
+        if decision['action'] == 'increase':
+            print(Fore.CYAN + f"[自适应并发] 详情并发提高到 {decision['limit']}（{decision['reason']}）")
+            self.add_log(f"[自适应并发] 详情并发提高到 {decision['limit']}", 'cyan')
+        elif decision['action'] == 'decrease':
+            print(Fore.YELLOW + f"[自适应并发] 详情并发降低到 {decision['limit']}（{decision['reason']}）")
+            self.add_log(f"[自适应并发] 详情并发降低到 {decision['limit']}（{decision['reason']}）", 'yellow')
     
     def stop(self):
         """停止爬取"""
@@ -0,0 +1,290 @@
+import asyncio
+import concurrent.futures
+import os
+
+from colorama import Fore
+
+from api_crawler import APICrawler
+from request_engine import DONE, REFRESH_AUTH, SendState, parse_retry_after
+from utils import logger
+
+
+def load_aiohttp():
+    """按需加载异步HTTP客户端"""
+    try:
+        import aiohttp
+        return aiohttp
+    except ImportError as e:
+        raise RuntimeError('缺少异步HTTP依赖，请执行: pip install aiohttp') from e
+
+
+class AsyncAPICrawler(APICrawler):
+    """基于asyncio的爬虫引擎：单个事件循环驱动列表和详情请求，通过信号量让大量详情请求同时在途
+
+    签名、列表/详情解析、去重和存储写入与APICrawler保持一致，产出的订单数据与parse_detail_data相同。
+    """
+
+    def __init__(self, browser_manager, gui_server, storage=None):
+        super().__init__(browser_manager, gui_server, storage)
+        # 启动时检查依赖，缺少aiohttp时直接报错，而不是在爬取开始后才失败
+        self._aiohttp = load_aiohttp()
+        # 同时在途的详情请求上限
+        self.async_detail_concurrency = max(1, int(os.getenv('ASYNC_DETAIL_CONCURRENCY', '200')))
+        self._detail_semaphore = None
+        self._in_flight = set()
+        self._storage_executor = None
+
+    def _run_windows(self, windows, settlement_status=None, stop_event=None):
+        """在独立的事件循环中爬取所有时间窗口"""
+        if not windows:
+            return
+        asyncio.run(self._run_windows_async(windows, settlement_status, stop_event))
+
+    def get_pipeline_stats(self):
+        if self._detail_semaphore is None:
+            return None
+        return {
+            'detail_in_flight': len(self._in_flight),
+            'detail_concurrency': self.async_detail_concurrency,
+            'stored': self.processed_count,
+        }
+
+    def _log_transport_stats(self):
+        # 异步引擎的请求走aiohttp连接池，不经过HttpTransport，没有可输出的连接池统计
+        pass
+
+    async def _run_windows_async(self, windows, settlement_status, stop_event):
+        aiohttp = self._aiohttp
+        loop = asyncio.get_running_loop()
+
+        # 获取认证信息可能需要等待浏览器线程（同步阻塞），放到线程池中执行
+        if not await loop.run_in_executor(None, self._ensure_auth_info):
+            return
+
+        self._detail_semaphore = asyncio.Semaphore(self.async_detail_concurrency)
+        self._in_flight = set()
+        window_semaphore = asyncio.Semaphore(self.crawl_shard_workers)
+        # 存储写入是同步IO，交给单独的写入线程串行执行，避免阻塞事件循环
+        self._storage_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='storage-writer')
+        connector = aiohttp.TCPConnector(limit=self.async_detail_concurrency + self.crawl_shard_workers)
+        timeout = aiohttp.ClientTimeout(total=30)
+
+        logger.info(f"异步爬取引擎启动，详情并发上限: {self.async_detail_concurrency}")
+        print(Fore.CYAN + f"异步爬取引擎启动，详情并发上限: {self.async_detail_concurrency}")
+        self.add_log(f"异步爬取引擎启动，详情并发上限: {self.async_detail_concurrency}", 'cyan')
+
+        async def run_window(index, window_start, window_end):
+            window_label = f"[窗口 {index}/{len(windows)}] " if len(windows) > 1 else ''
+            async with window_semaphore:
+                await self._crawl_window_async(session, window_start, window_end, settlement_status, stop_event, window_label)
+            return window_label
+
+        try:
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+                results = await asyncio.gather(
+                    *(run_window(index, window_start, window_end) for index, (window_start, window_end) in enumerate(windows, 1)),
+                    return_exceptions=True,
+                )
+                for result in results:
+                    if isinstance(result, Exception):
+                        print(Fore.RED + f"爬取时间窗口失败: {str(result)}")
+                        logger.error(f"爬取时间窗口失败: {str(result)}")
+                        self.add_log(f"爬取时间窗口失败: {str(result)}", 'red')
+
+                # 等待在途的详情请求全部完成（收到停止信号时直接取消）
+                if self._should_stop(stop_event):
+                    for task in list(self._in_flight):
+                        task.cancel()
+                if self._in_flight:
+                    await asyncio.gather(*list(self._in_flight), return_exceptions=True)
+        finally:
+            self._storage_executor.shutdown(wait=True)
+            self._detail_semaphore = None
+
+    async def _crawl_window_async(self, session, start_timestamp, end_timestamp, settlement_status, stop_event, window_label=''):
+        """翻页爬取单个时间窗口，列表页顺序获取，每个订单的详情作为独立任务并发执行"""
+        window_key = (start_timestamp, end_timestamp)
+        page_number = self._window_start_page(window_key, window_label)
+        if page_number is None:
+            return
+        first_page = None
+        if self._window_planner is not None:
+            first_page = self._window_planner.take_first_page(start_timestamp, end_timestamp)
+
+        while not self._should_stop(stop_event):
+            print(Fore.CYAN + f"{window_label}处理第 {page_number} 页...")
+            logger.info(f"{window_label}处理第 {page_number} 页")
+            self.add_log(f"{window_label}处理第 {page_number} 页...", 'cyan')
+
+            if page_number == 1 and first_page is not None:
+                orders, pagination = first_page
+            else:
+                orders, pagination = await self._get_order_list_async(
+                    session, start_timestamp, end_timestamp, page_number, self.page_size, settlement_status
+                )
+
+            if pagination.get('failed'):
+                self._list_page_failed(window_key, window_label, page_number)
+                break
+            if not orders:
+                await self._run_blocking(self._checkpoint_page_empty, window_key, page_number)
+                if page_number == 1:
+                    logger.warning(f"{window_label}没有找到订单，爬取结束")
+                    print(Fore.RED + f"{window_label}没有找到订单，爬取结束")
+                    self.add_log(f"{window_label}没有找到订单，爬取结束", 'red')
+                else:
+                    logger.info(f"{window_label}已获取所有订单，爬取完成")
+                    print(Fore.GREEN + f"{window_label}已获取所有订单，爬取完成")
+                    self.add_log(f"{window_label}已获取所有订单，爬取完成", 'green')
+                break
+
+            current_page, total_pages = self._record_page_progress(window_key, window_label, page_number, orders, pagination)
+
+            # 检查点和指纹库读写是同步文件/SQLite操作，放到线程池中执行
+            orders = await self._run_blocking(self._orders_to_submit, window_key, page_number, orders, pagination, window_label)
+            for order in orders:
+                if self._should_stop(stop_event):
+                    break
+                await self._submit_detail_task(session, order, stop_event)
+
+            if self._should_stop(stop_event):
+                logger.info("收到停止信号，停止翻页")
+                break
+
+            if current_page >= total_pages and total_pages > 0:
+                await self._run_blocking(self._checkpoint_window_finished, window_key, current_page)
+                logger.info(f"{window_label}已到达最后一页（第 {current_page} 页，共 {total_pages} 页），爬取完成")
+                print(Fore.GREEN + f"{window_label}已到达最后一页（第 {current_page} 页，共 {total_pages} 页），爬取完成")
+                self.add_log(f"{window_label}已到达最后一页（第 {current_page} 页，共 {total_pages} 页），爬取完成", 'green')
+                break
+
+            page_number += 1
+
+            # 防止请求过快
+            await asyncio.sleep(self.request_delay)
+
+    async def _submit_detail_task(self, session, order, stop_event):
+        # 在途任务过多时等待部分完成，避免列表翻页远远领先于详情请求
+        while len(self._in_flight) >= self.async_detail_concurrency * 2:
+            await asyncio.wait(list(self._in_flight), return_when=asyncio.FIRST_COMPLETED)
+        task = asyncio.ensure_future(self._process_order_async(session, order, stop_event))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _process_order_async(self, session, order, stop_event):
+        order_no = order['order_no']
+        try:
+            async with self._detail_semaphore:
+                if self._should_stop(stop_event):
+                    return
+                detail_data = await self._get_order_detail_async(session, order_no, order['order_type'])
+        except Exception as e:
+            print(Fore.RED + f"获取订单 {order_no} 详情时出错: {str(e)}")
+            logger.error(f"获取订单 {order_no} 详情时出错: {str(e)}")
+            self.add_log(f"获取订单 {order_no} 详情时出错: {str(e)}", 'red')
+            detail_data = None
+
+        if detail_data:
+            # 只使用订单详情中的信息，添加订单号以便识别
+            detail_data['order_no'] = order_no
+            self._mark_fingerprint_pending(order)
+            logger.info(f"成功获取订单 {order_no} 详情")
+            result = detail_data
+        else:
+            print(Fore.YELLOW + f"未获取到订单 {order_no} 详情数据，使用订单列表中的基本信息")
+            logger.warning(f"未获取到订单 {order_no} 详情数据，使用订单列表中的基本信息")
+            self.add_log(f"未获取到订单 {order_no} 详情数据，使用订单列表中的基本信息", 'yellow')
+            result = order
+
+        if self._should_stop(stop_event):
+            return
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._storage_executor, self._store_crawled_order, result)
+
+    async def _perform_async(self, session, method, url, params, headers):
+        """发送一次异步请求，返回(状态码, 响应JSON, Retry-After秒数, 异常)"""
+        aiohttp = self._aiohttp
+        try:
+            if method == 'POST':
+                request = session.post(url, json=params, headers=headers)
+            else:
+                request = session.get(url, params={k: str(v) for k, v in params.items()}, headers=headers)
+            async with request as response:
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if response.status != 200:
+                    return response.status, None, retry_after, None
+                try:
+                    return response.status, await response.json(content_type=None), retry_after, None
+                except ValueError:
+                    return response.status, None, retry_after, None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return None, None, None, e
+
+    async def _send_async(self, session, method, url, params, build_headers):
+        """RequestEngine.send的异步版本：共用同一个令牌桶、重试策略和请求结果回调，成功时返回响应JSON，否则返回None"""
+        engine = self.request_engine
+        loop = asyncio.get_running_loop()
+        state = SendState()
+        while True:
+            wait = engine.rate_limiter.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            started_at = engine.begin_attempt()
+            result = await self._perform_async(session, method, url, params, build_headers())
+            action, value = engine.resolve_attempt(state, url, started_at, result)
+            if action == DONE:
+                return value
+            if action == REFRESH_AUTH:
+                # 浏览器线程交互是同步阻塞的，放到线程池中执行
+                if await loop.run_in_executor(None, self._refresh_auth_from_browser, started_at):
+                    continue
+                engine.auth_refresh_failed()
+                return None
+            await asyncio.sleep(value)
+
+    async def _run_blocking(self, func, *args):
+        """在默认线程池中执行同步阻塞调用（SQLite、检查点文件等），避免阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    async def _ensure_auth_info_async(self):
+        if self.is_auth_valid():
+            return True
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._ensure_auth_info)
+
+    async def _get_order_list_async(self, session, start_timestamp, end_timestamp, page_number, page_size, settlement_status=None):
+        """异步获取订单列表，返回值与get_order_list_from_api一致"""
+        try:
+            if not await self._ensure_auth_info_async():
+                return [], self._empty_pagination(page_number, failed=True)
+
+            params = self._build_order_list_params(start_timestamp, end_timestamp, page_number, page_size, settlement_status)
+            api_response = await self._send_async(
+                session, 'POST', self.order_list_api, params, lambda: self._build_signed_headers(params, method='POST')
+            )
+            if api_response is not None:
+                return self._parse_order_list_response(api_response, page_number)
+        except Exception as e:
+            print(Fore.RED + f"通过API获取订单列表失败: {str(e)}")
+            logger.error(f"通过API获取订单列表失败: {str(e)}")
+            self.add_log(f"通过API获取订单列表失败: {str(e)}", 'red')
+        return [], self._empty_pagination(page_number, failed=True)
+
+    async def _get_order_detail_async(self, session, order_no, order_type):
+        """异步获取订单详情，返回值与get_order_detail_from_api一致"""
+        cached = await self._run_blocking(self._get_cached_detail, order_no, order_type)
+        if cached is not None:
+            return cached
+        if not await self._ensure_auth_info_async():
+            return None
+
+        params = self._build_order_detail_params(order_no, order_type)
+        api_response = await self._send_async(
+            session, 'GET', self.order_detail_api, params, lambda: self._build_detail_headers(params)
+        )
+        if api_response is None:
+            return None
+        detail_data = self.parse_detail_data(api_response)
+        await self._run_blocking(self._cache_detail, order_no, order_type, detail_data)
+        return detail_data
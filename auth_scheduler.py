@@ -0,0 +1,121 @@
+import threading
+import time
+
+from colorama import Fore
+
+from utils import logger
+
+
+def auth_token(auth_info):
+    if not auth_info:
+        return ''
+    return auth_info.get('token') or auth_info.get('pp_token') or ''
+
+
+class AuthRefreshScheduler(threading.Thread):
+    """在token过期前主动刷新认证信息的后台线程
+
+    token有效期优先使用从真实"token time out"响应中观察到的时长，没有观察值时使用配置的有效期；
+    到期前refresh_margin秒从浏览器线程获取最新认证信息，token已更换则立即切换，否则稍后重试。
+    不保存热备认证信息：浏览器端token未更换时取到的仍是当前即将过期的token，无法在过期后顶替使用。
+    线程只能启动一次，爬取结束时stop()，下次爬取通过restarted()创建新线程并沿用观察到的有效期。
+    """
+
+    def __init__(self, crawler, token_ttl=3600, refresh_margin=120, retry_interval=30, observed_ttl=None):
+        super().__init__(name='auth-refresh-scheduler', daemon=True)
+        self.crawler = crawler
+        self.token_ttl = max(1.0, float(token_ttl))
+        self.refresh_margin = max(0.0, float(refresh_margin))
+        self.retry_interval = max(1.0, float(retry_interval))
+        self.observed_ttl = observed_ttl
+        self.refresh_count = 0
+        self._observed_tokens = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._wakeup = threading.Event()
+
+    def effective_ttl(self):
+        if self.observed_ttl is None:
+            return self.token_ttl
+        return min(self.token_ttl, self.observed_ttl)
+
+    def next_refresh_at(self):
+        obtained_at = getattr(self.crawler, 'auth_obtained_at', None) or time.time()
+        return obtained_at + self.effective_ttl() - self.refresh_margin
+
+    def observe_expiry(self, token, requested_at=None):
+        """请求返回token过期时调用，记录该token实际的存活时长"""
+        obtained_at = getattr(self.crawler, 'auth_obtained_at', None)
+        if not token or obtained_at is None:
+            return
+        if requested_at is not None and obtained_at > requested_at:
+            # 请求发出后token已被其他线程更换，过期的是旧token
+            return
+        with self._lock:
+            if token in self._observed_tokens:
+                return
+            self._observed_tokens.add(token)
+            ttl = max(1.0, time.time() - obtained_at)
+            # 取观察到的最短存活时长，保证下次在它之前刷新
+            self.observed_ttl = ttl if self.observed_ttl is None else min(self.observed_ttl, ttl)
+        logger.info(f"[认证调度] 观察到token实际有效期约 {ttl:.0f} 秒，下次将提前 {self.refresh_margin:.0f} 秒刷新")
+        self._wakeup.set()
+
+    def run(self):
+        logger.info(f"[认证调度] 已启动，token有效期 {self.effective_ttl():.0f} 秒，提前 {self.refresh_margin:.0f} 秒刷新")
+        while not self._stop_event.is_set():
+            wait = self.next_refresh_at() - time.time()
+            if wait > 0:
+                self._wakeup.wait(wait)
+                self._wakeup.clear()
+                continue
+            if not self._refresh_once():
+                # 刷新失败或token尚未更换，稍后再试
+                self._stop_event.wait(self.retry_interval)
+
+    def _refresh_once(self):
+        current_token = auth_token(self.crawler.auth_info)
+        try:
+            auth_info = self.crawler.fetch_auth_from_source()
+        except Exception as e:
+            logger.warning(f"[认证调度] 主动刷新认证信息失败: {str(e)}")
+            return False
+        new_token = auth_token(auth_info)
+        if not new_token:
+            logger.warning("[认证调度] 主动刷新未获取到有效token")
+            return False
+        if new_token == current_token:
+            # token未更换：浏览器端尚未更新，稍后重试
+            logger.info("[认证调度] 浏览器端token尚未更换，稍后重试")
+            return False
+        self.crawler.update_auth_info(auth_info)
+        self.refresh_count += 1
+        print(Fore.GREEN + "[认证调度] 已在token过期前切换到新的认证信息")
+        logger.info("[认证调度] 已在token过期前切换到新的认证信息")
+        self.crawler.add_log("已在token过期前主动刷新认证信息", 'green')
+        return True
+
+    def stats(self):
+        return {
+            'token_ttl': self.token_ttl,
+            'observed_ttl': self.observed_ttl,
+            'effective_ttl': self.effective_ttl(),
+            'next_refresh_in': max(0.0, self.next_refresh_at() - time.time()),
+            'refresh_count': self.refresh_count,
+        }
+
+    def restarted(self):
+        """返回一个参数和观察到的有效期都相同的新调度线程（已停止的线程不能再次启动）"""
+        return AuthRefreshScheduler(
+            self.crawler,
+            token_ttl=self.token_ttl,
+            refresh_margin=self.refresh_margin,
+            retry_interval=self.retry_interval,
+            observed_ttl=self.observed_ttl,
+        )
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        self._wakeup.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
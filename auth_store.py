@@ -0,0 +1,66 @@
+import copy
+import json
+import os
+import threading
+
+from utils import logger
+
+
+class JsonFileStore:
+    """JSON文件的内存快照（auth_cache.json、auth_info.json、config.json共用）
+
+    以文件的mtime、大小和inode作为签名，签名不变时直接返回内存中的快照，不再打开和解析文件；
+    通过save写入的文件会同时更新快照。每次返回的都是快照的副本，调用方可以随意修改。
+    """
+
+    def __init__(self):
+        self._snapshots = {}
+        self._lock = threading.Lock()
+        self.stats = {'reads': 0, 'hits': 0}
+
+    @staticmethod
+    def _signature(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def load(self, path, default=None):
+        """返回文件内容，文件不存在时返回default；解析失败时抛出异常（不缓存，下次调用重新读取）"""
+        path = os.path.abspath(path)
+        with self._lock:
+            try:
+                signature = self._signature(path)
+            except FileNotFoundError:
+                self._snapshots.pop(path, None)
+                return copy.deepcopy(default)
+            snapshot = self._snapshots.get(path)
+            if snapshot is not None and snapshot[0] == signature:
+                self.stats['hits'] += 1
+                return copy.deepcopy(snapshot[1])
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.stats['reads'] += 1
+            self._snapshots[path] = (signature, data)
+            logger.info(f"已重新读取文件: {path}")
+            return copy.deepcopy(data)
+
+    def save(self, path, data, **dump_kwargs):
+        """原子写入文件并更新快照"""
+        path = os.path.abspath(path)
+        data = copy.deepcopy(data)
+        with self._lock:
+            temp_path = f"{path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, **dump_kwargs)
+            os.replace(temp_path, path)
+            self._snapshots[path] = (self._signature(path), data)
+
+    def remove(self, path):
+        path = os.path.abspath(path)
+        with self._lock:
+            self._snapshots.pop(path, None)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+# 进程内共用一个实例，浏览器管理器、爬虫和主程序读到的是同一份快照
+auth_store = JsonFileStore()
@@ -0,0 +1,99 @@
+"""签名生成微基准：对比每次重新拼装（generate_sign + 构造请求头）与复用SigningContext的每秒签名数
+
+运行: python bench_sign_generator.py [每项次数，默认20000]
+"""
+import sys
+import time
+
+from sign_generator import APPSOURCE, PP_CLIENT_VER, PP_DEVICE_TYPE, SigningContext, generate_sign
+
+TOKEN = '66a4aaf9-2dce-459e-8ca5-685a9ef62308'
+DEVICE_ID = '8db6b9f4907b241696062774623cb93d'
+COUNTRY_CODE = 'gsa'
+MERCHANT_ID = '125060602371651'
+LIST_PARAMS = {
+    'current': 1, 'pageSize': 20, 'orderTypes': ["300-0"], 'pageIndex': 1,
+    'createStartTime': 1764630000000, 'createEndTime': 1769727599999,
+    'countryCodes': ['GH'], 'startOrderAmount': None, 'endOrderAmount': None,
+}
+DETAIL_PARAMS = {'orderNo': '2601290000000001', 'orderType': '300-0'}
+
+
+def legacy_headers(params, method):
+    """优化前的generate_signature_headers：每次重新签名并构造完整请求头"""
+    signature, timestamp = generate_sign(TOKEN, DEVICE_ID, PP_DEVICE_TYPE, PP_CLIENT_VER, APPSOURCE, COUNTRY_CODE, params, method)
+    return {
+        "accept": "application/json, text/plain, */*",
+        "accept-language": "zh-CN,zh;q=0.9",
+        "appsource": APPSOURCE,
+        "content-type": "application/json",
+        "countrycode": COUNTRY_CODE,
+        "merchantid": MERCHANT_ID,
+        "origin": "https://business.palmpay.com",
+        "pp_client_ver": PP_CLIENT_VER,
+        "pp_device_id": DEVICE_ID,
+        "pp_device_type": PP_DEVICE_TYPE,
+        "pp_req_sign": signature,
+        "pp_req_sign_2": signature,
+        "pp_timestamp": timestamp,
+        "pp_token": TOKEN,
+        "priority": "u=1, i",
+        "referer": "https://business.palmpay.com/",
+        "sec-ch-ua": 'Not(A:Brand";v="8", "Chromium";v="144", "Google Chrome";v="144"',
+        "sec-ch-ua-mobile": "?0",
+        "sec-ch-ua-platform": "macOS",
+        "sec-fetch-dest": "empty",
+        "sec-fetch-mode": "cors",
+        "sec-fetch-site": "same-site",
+        "tntcode": "palmpayhk",
+        "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36"
+    }
+
+
+def check_identical():
+    """固定时间戳下，SigningContext与generate_sign的签名和请求头必须完全一致"""
+    for method, params in (('POST', LIST_PARAMS), ('GET', DETAIL_PARAMS)):
+        context = SigningContext(TOKEN, DEVICE_ID, COUNTRY_CODE, method=method, merchantid=MERCHANT_ID)
+        for timestamp in (1769656387097, 1769656387098, 1769656387098):
+            fixed_params = dict(params, timestamp=timestamp)
+            expected = legacy_headers(fixed_params, method)
+            actual = context.headers(fixed_params)
+            if actual != expected or list(actual) != list(expected):
+                raise SystemExit(f"{method} 签名结果不一致: {actual} != {expected}")
+    print("签名结果与generate_sign逐字节一致")
+
+
+def bench(label, func, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - started
+    rate = iterations / elapsed
+    print(f"{label:<36} {rate:>12,.0f} 次/秒")
+    return rate
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    check_identical()
+
+    post_context = SigningContext(TOKEN, DEVICE_ID, COUNTRY_CODE, method='POST', merchantid=MERCHANT_ID)
+    get_context = SigningContext(TOKEN, DEVICE_ID, COUNTRY_CODE, method='GET', merchantid=MERCHANT_ID)
+    counter = iter(range(1769656387097, 1769656387097 + 10 * iterations))
+
+    before = bench("POST 列表 优化前", lambda: legacy_headers(LIST_PARAMS, 'POST'), iterations)
+    after = bench("POST 列表 SigningContext", lambda: post_context.headers(LIST_PARAMS), iterations)
+    print(f"{'':<36} {after / before:>11.2f}x")
+
+    before = bench("GET 详情 优化前", lambda: legacy_headers(DETAIL_PARAMS, 'GET'), iterations)
+    # 每次都是新的毫秒时间戳，不命中缓存
+    after = bench("GET 详情 SigningContext（不同毫秒）",
+                  lambda: get_context.headers(dict(DETAIL_PARAMS, timestamp=next(counter))), iterations)
+    print(f"{'':<36} {after / before:>11.2f}x")
+    # 实际并发请求：同一毫秒内的详情请求复用签名
+    after = bench("GET 详情 SigningContext（实时时间戳）", lambda: get_context.headers(DETAIL_PARAMS), iterations)
+    print(f"{'':<36} {after / before:>11.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,9 +2,10 @@ import time
 import os
 import threading
 import webbrowser
-import json
 import sys
 
+from auth_store import auth_store
+
 # 条件性导入playwright
 def get_playwright():
     try:
@@ -39,15 +40,10 @@ class BrowserManager:
         self._skip_browser_logged = False  # 标志位，控制跳过浏览器操作时的日志输出
     
     def load_config(self):
-        """加载配置文件"""
-        print(f"加载配置文件，路径: {self.config_path}")
-        print(f"配置文件是否存在: {os.path.exists(self.config_path)}")
+        """加载配置文件（文件未修改时直接使用内存快照）"""
         if os.path.exists(self.config_path):
             try:
-                with open(self.config_path, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                print(f"从配置文件读取的内容: {config}")
-                return config
+                return auth_store.load(self.config_path)
             except Exception as e:
                 print(f"加载配置文件失败: {str(e)}")
         return {
@@ -123,8 +119,7 @@ class BrowserManager:
             # 尝试从本地文件加载认证信息
             if os.path.exists(self.auth_info_path):
                 try:
-                    with open(self.auth_info_path, 'r', encoding='utf-8') as f:
-                        auth_info = json.load(f)
+                    auth_info = auth_store.load(self.auth_info_path)
                     print("从本地文件加载认证信息成功")
                     return True
                 except Exception as e:
@@ -146,8 +141,7 @@ class BrowserManager:
             }
             
             # 保存认证信息到本地文件
-            with open(self.auth_info_path, 'w', encoding='utf-8') as f:
-                json.dump(auth_info, f, ensure_ascii=False, indent=2)
+            auth_store.save(self.auth_info_path, auth_info, ensure_ascii=False, indent=2)
             print("认证信息已保存到本地文件")
             
             return True
@@ -200,8 +194,7 @@ class BrowserManager:
                 # 检查是否已经有保存的认证信息
                 if os.path.exists(self.auth_info_path):
                     try:
-                        with open(self.auth_info_path, 'r', encoding='utf-8') as f:
-                            auth_info = json.load(f)
+                        auth_info = auth_store.load(self.auth_info_path)
                         print("从本地文件加载认证信息成功")
                         # 检查认证信息是否完整
                         if auth_info.get('pp_token') or auth_info.get('token'):
@@ -238,8 +231,7 @@ class BrowserManager:
                 if auth_info:
                     print("自动获取认证字段成功")
                     # 保存认证信息到本地文件
-                    with open(self.auth_info_path, 'w', encoding='utf-8') as f:
-                        json.dump(auth_info, f, ensure_ascii=False, indent=2)
+                    auth_store.save(self.auth_info_path, auth_info, ensure_ascii=False, indent=2)
                     return True
                 else:
                     print("已登录但获取认证字段失败，继续执行")
@@ -266,8 +258,7 @@ class BrowserManager:
             if auth_info:
                 print("自动获取认证字段成功")
                 # 保存认证信息到本地文件
-                with open(self.auth_info_path, 'w', encoding='utf-8') as f:
-                    json.dump(auth_info, f, ensure_ascii=False, indent=2)
+                auth_store.save(self.auth_info_path, auth_info, ensure_ascii=False, indent=2)
                 return True
             else:
                 print("自动获取认证字段失败，但登录过程已完成")
@@ -608,8 +599,7 @@ class BrowserManager:
             # 更新认证信息
             current_config['auth_info'] = auth_info
             # 保存到配置文件
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(current_config, f, ensure_ascii=False, indent=2)
+            auth_store.save(self.config_path, current_config, ensure_ascii=False, indent=2)
             print("配置文件已更新")
         except Exception as e:
             print(f"更新配置文件失败: {str(e)}")
@@ -621,7 +611,7 @@ class BrowserManager:
             if self.skip_browser:
                 if not self._skip_browser_logged:
                     print("从配置文件读取认证信息")
-                # 每次都重新读取配置文件，确保使用最新的配置
+                # 配置文件被修改后才会重新读取，否则使用内存快照
                 current_config = self.load_config()
                 auth_info = current_config.get('auth_info', {})
                 # 确保返回的对象包含必要的字段
@@ -636,8 +626,7 @@ class BrowserManager:
             if self.use_system_browser:
                 if os.path.exists(self.auth_info_path):
                     try:
-                        with open(self.auth_info_path, 'r', encoding='utf-8') as f:
-                            auth_info = json.load(f)
+                        auth_info = auth_store.load(self.auth_info_path)
                         print("从本地文件加载认证信息成功")
                         # 检查认证信息是否完整
                         if auth_info.get('pp_token') or auth_info.get('token'):
@@ -780,8 +769,7 @@ class BrowserManager:
             # 尝试从本地文件加载认证信息
             if os.path.exists(self.auth_info_path):
                 try:
-                    with open(self.auth_info_path, 'r', encoding='utf-8') as f:
-                        auth_info = json.load(f)
+                    auth_info = auth_store.load(self.auth_info_path)
                     print("从本地文件加载认证信息成功")
                     return auth_info
                 except Exception as e:
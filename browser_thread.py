@@ -1,5 +1,4 @@
 import threading
-import time
 from colorama import Fore
 
 class BrowserOperationThread(threading.Thread):
@@ -14,6 +13,11 @@ class BrowserOperationThread(threading.Thread):
         self.running = True
         self.shared_auth_info = None  # 共享的认证信息，供其他线程读取
         self.auth_info_lock = threading.Lock()  # 认证信息的锁
+        # 认证信息刷新完成时通知等待方；每完成一次get_auth_info操作，auth_refresh_generation加1
+        self.auth_info_condition = threading.Condition(self.auth_info_lock)
+        self.auth_refresh_generation = 0
+        self._auth_refresh_pending = False
+        self._operation_event = threading.Event()  # 有新操作时立即唤醒线程
         self._skip_browser_logged = False  # 标志位，控制跳过浏览器操作时的日志输出
     
     def run(self):
@@ -24,10 +28,13 @@ class BrowserOperationThread(threading.Thread):
         # 初始化浏览器
         self.initialize_browser()
         
-        # 处理操作队列
-        while self.running:
-            self.process_operations()
-            time.sleep(0.1)
+        # 处理操作队列；线程退出时放弃尚未执行的认证刷新，避免等待方一直等不到结果
+        try:
+            while self.running:
+                self.process_operations()
+                self._operation_event.wait(0.1)
+        finally:
+            self._abandon_auth_refresh()
     
     def initialize_browser(self):
         """初始化浏览器"""
@@ -93,6 +100,8 @@ class BrowserOperationThread(threading.Thread):
             if self.operations:
                 operation = self.operations.pop(0)
                 self.execute_operation(operation)
+            if not self.operations:
+                self._operation_event.clear()
     
     def execute_operation(self, operation):
         """执行操作"""
@@ -107,7 +116,10 @@ class BrowserOperationThread(threading.Thread):
             elif operation_type == 'check_order_page_status':
                 result = self.check_order_page_status()
             elif operation_type == 'get_auth_info':
-                result = self.get_auth_info()
+                try:
+                    result = self.get_auth_info()
+                finally:
+                    self._finish_auth_refresh()
             else:
                 result = None
             
@@ -149,6 +161,47 @@ class BrowserOperationThread(threading.Thread):
             self.gui_server.add_log(f"获取认证信息失败: {str(e)}", "red")
             return False
     
+    def _finish_auth_refresh(self):
+        """一次认证信息获取结束（无论成功与否），唤醒所有等待方"""
+        with self.auth_info_condition:
+            self.auth_refresh_generation += 1
+            self._auth_refresh_pending = False
+            self.auth_info_condition.notify_all()
+
+    def _abandon_auth_refresh(self):
+        """线程停止：清除进行中的刷新标记并唤醒等待方（等待方返回None）"""
+        with self.auth_info_condition:
+            self._auth_refresh_pending = False
+            self.auth_info_condition.notify_all()
+
+    def refresh_auth_info(self, timeout=30):
+        """请求刷新认证信息并等待结果，返回刷新后的共享认证信息（超时返回None）
+
+        同一时间只会向队列提交一次get_auth_info，刷新进行中的其他调用方等待同一次结果，
+        刷新完成后立即被唤醒，不需要固定等待。
+        """
+        with self.auth_info_condition:
+            if not self.running:
+                return None
+            generation = self.auth_refresh_generation
+            should_enqueue = not self._auth_refresh_pending
+            self._auth_refresh_pending = True
+        if should_enqueue:
+            self.add_operation({
+                'type': 'get_auth_info',
+                'callback': None  # 结果通过共享变量和条件变量返回
+            })
+        with self.auth_info_condition:
+            self.auth_info_condition.wait_for(
+                lambda: self.auth_refresh_generation != generation or not self.running, timeout=timeout
+            )
+            if self.auth_refresh_generation == generation:
+                if not self.is_alive():
+                    # 线程已退出，排队的刷新不会再执行，下次调用重新提交
+                    self._auth_refresh_pending = False
+                return None
+            return self.shared_auth_info
+
     def navigate_to_order_list(self):
         """导航到订单列表页面"""
         try:
@@ -297,10 +350,12 @@ class BrowserOperationThread(threading.Thread):
         """添加操作到队列"""
         with self.operation_lock:
             self.operations.append(operation)
+        self._operation_event.set()
     
     def stop(self):
         """停止线程"""
         self.running = False
+        self._abandon_auth_refresh()
         # 检查是否跳过浏览器操作
         if not (hasattr(self.browser_manager, 'skip_browser') and self.browser_manager.skip_browser):
             self.browser_manager.close_browser()
@@ -0,0 +1,44 @@
+import os
+import time
+
+
+class BufferedFileWriter:
+    """常驻打开的追加写文件，按策略把缓冲区刷到磁盘
+
+    每写入flush_rows行、或距上次刷盘超过flush_interval_ms毫秒（在下一次写入时检查）、
+    或显式调用flush()时刷盘；fsync为True时刷盘后再调用os.fsync，保证断电后数据仍在。
+    """
+
+    def __init__(self, path, encoding='utf-8', newline=None, flush_rows=100, flush_interval_ms=1000, fsync=False,
+                 buffer_size=1 << 16):
+        self.path = path
+        self.flush_rows = max(1, int(flush_rows))
+        self.flush_interval = max(0.0, float(flush_interval_ms)) / 1000
+        self.fsync = fsync
+        self._file = open(path, 'a', encoding=encoding, newline=newline, buffering=buffer_size)
+        self._rows_since_flush = 0
+        self._last_flush_at = time.monotonic()
+
+    def write(self, text):
+        self._file.write(text)
+
+    def rows_written(self, count=1):
+        """记录写入的行数，满足刷盘条件时刷盘"""
+        self._rows_since_flush += count
+        if self._rows_since_flush >= self.flush_rows or time.monotonic() - self._last_flush_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self._file.closed:
+            return
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._rows_since_flush = 0
+        self._last_flush_at = time.monotonic()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
@@ -0,0 +1,118 @@
+import collections
+import contextlib
+import threading
+import time
+
+from utils import logger
+
+
+class AIMDConcurrencyController:
+    """AIMD自适应并发控制：延迟稳定且没有限流时逐步加1，出现429/503/服务端繁忙时按比例减半
+
+    既是并发闸门（slot()限制同时在途的请求数），也根据请求结果实时调整上限。
+    """
+
+    def __init__(self, initial_limit=5, min_limit=1, max_limit=20, increase_step=1, decrease_factor=0.5,
+                 latency_tolerance=2.0, decrease_cooldown=1.0, on_change=None):
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.limit = float(min(self.max_limit, max(self.min_limit, int(initial_limit))))
+        self.increase_step = max(0.0, float(increase_step))
+        self.decrease_factor = min(1.0, max(0.0, float(decrease_factor)))
+        # 窗口平均延迟超过基线的倍数时视为延迟不稳定，暂停增加
+        self.latency_tolerance = max(1.0, float(latency_tolerance))
+        # 两次减小之间的最短间隔（秒），避免同一波限流响应把并发连续砍到底
+        self.decrease_cooldown = max(0.0, float(decrease_cooldown))
+        self.on_change = on_change
+        self.in_flight = 0
+        self.baseline_latency = None
+        self.decisions = collections.deque(maxlen=20)
+        self._window_latencies = []
+        self._last_decrease_at = 0.0
+        self._condition = threading.Condition()
+
+    @property
+    def current_limit(self):
+        return int(self.limit)
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def on_success(self, latency):
+        """记录一次成功请求的延迟，每收满一个窗口（等于当前并发数）做一次增加判断"""
+        with self._condition:
+            self._window_latencies.append(latency)
+            if len(self._window_latencies) < int(self.limit):
+                return
+            window_latency = sum(self._window_latencies) / len(self._window_latencies)
+            self._window_latencies = []
+            # 基线取历史窗口的最低平均延迟，并允许缓慢上浮以适应不同时段的接口速度
+            if self.baseline_latency is None:
+                self.baseline_latency = window_latency
+            else:
+                self.baseline_latency = min(window_latency, self.baseline_latency * 1.1)
+
+            if window_latency > self.baseline_latency * self.latency_tolerance:
+                self._record('hold', f"窗口平均延迟 {window_latency:.3f}s 高于基线 {self.baseline_latency:.3f}s")
+                return
+            if int(self.limit) >= self.max_limit:
+                return
+            self.limit = min(float(self.max_limit), self.limit + self.increase_step)
+            self._record('increase', f"窗口平均延迟 {window_latency:.3f}s，无限流")
+            self._condition.notify_all()
+
+    def on_throttle(self, reason='服务端限流'):
+        """出现429/503/服务端繁忙时按比例减小并发"""
+        with self._condition:
+            now = time.monotonic()
+            if now - self._last_decrease_at < self.decrease_cooldown:
+                return
+            self._last_decrease_at = now
+            self._window_latencies = []
+            new_limit = max(float(self.min_limit), float(int(self.limit * self.decrease_factor)))
+            if int(new_limit) == int(self.limit):
+                return
+            self.limit = new_limit
+            self._record('decrease', reason)
+
+    def _record(self, action, reason):
+        decision = {
+            'time': time.time(),
+            'action': action,
+            'limit': int(self.limit),
+            'in_flight': self.in_flight,
+            'reason': reason,
+        }
+        self.decisions.append(decision)
+        if action != 'hold':
+            logger.info(f"[自适应并发] {action} -> {int(self.limit)}（{reason}）")
+        if self.on_change:
+            self.on_change(decision)
+
+    def snapshot(self):
+        """当前并发上限、在途请求数及最近的调整记录"""
+        with self._condition:
+            return {
+                'limit': int(self.limit),
+                'in_flight': self.in_flight,
+                'min_limit': self.min_limit,
+                'max_limit': self.max_limit,
+                'baseline_latency': self.baseline_latency,
+                'recent_decisions': list(self.decisions),
+            }
@@ -0,0 +1,100 @@
+import queue
+import threading
+
+from colorama import Fore
+
+from detail_pool import DetailWorkerPool
+from utils import logger
+
+# 通知存储写入线程退出的哨兵
+_STOP = object()
+
+
+class CrawlPipeline:
+    """分阶段爬取流水线：列表获取 -> 详情工作线程 -> 存储写入线程，各阶段之间使用有界队列连接
+
+    每个订单的详情返回后立即进入存储队列；存储写入慢于接口时，存储队列写满会阻塞详情线程，
+    详情队列随之写满再阻塞列表获取，形成逐级背压。
+    """
+
+    def __init__(self, fetch_detail, store_order, detail_workers=5, detail_queue_size=0, storage_queue_size=0):
+        self.store_order = store_order
+        self.detail_pool = DetailWorkerPool(
+            fetch_detail,
+            self._enqueue_for_storage,
+            max_workers=detail_workers,
+            queue_size=detail_queue_size,
+        )
+        self.storage_queue = queue.Queue(maxsize=max(0, int(storage_queue_size)))
+        self._writer_thread = None
+        self._stats_lock = threading.Lock()
+        self.submitted_count = 0
+        self.detailed_count = 0
+        self.stored_count = 0
+
+    def start(self):
+        self.detail_pool.start()
+        self._writer_thread = threading.Thread(target=self._writer_loop, name='storage-writer', daemon=True)
+        self._writer_thread.start()
+        logger.info(
+            f"爬取流水线已启动: 详情worker {self.detail_pool.max_workers} 个，"
+            f"详情队列上限 {self.detail_pool.tasks.maxsize}，存储队列上限 {self.storage_queue.maxsize}"
+        )
+        return self
+
+    def _enqueue_for_storage(self, order):
+        # 存储队列满时阻塞详情线程，实现背压
+        self.storage_queue.put(order)
+        with self._stats_lock:
+            self.detailed_count += 1
+
+    def _writer_loop(self):
+        while True:
+            order = self.storage_queue.get()
+            try:
+                if order is _STOP:
+                    return
+                try:
+                    self.store_order(order)
+                except Exception as e:
+                    print(Fore.RED + f"写入订单 {order.get('order_no', '')} 失败: {str(e)}")
+                    logger.error(f"写入订单 {order.get('order_no', '')} 失败: {str(e)}")
+                with self._stats_lock:
+                    self.stored_count += 1
+            finally:
+                self.storage_queue.task_done()
+
+    def submit(self, order):
+        """列表阶段投递订单，详情队列满时阻塞"""
+        self.detail_pool.submit(order)
+        with self._stats_lock:
+            self.submitted_count += 1
+
+    def queue_depths(self):
+        """各阶段队列当前深度及累计计数"""
+        with self._stats_lock:
+            return {
+                'detail_queue': self.detail_pool.pending_count(),
+                'detail_queue_max': self.detail_pool.tasks.maxsize,
+                'storage_queue': self.storage_queue.qsize(),
+                'storage_queue_max': self.storage_queue.maxsize,
+                'submitted': self.submitted_count,
+                'detailed': self.detailed_count,
+                'stored': self.stored_count,
+            }
+
+    def cancel_pending(self):
+        """丢弃尚未获取详情的订单（用于停止爬取），已获取详情的订单仍交给存储线程"""
+        return self.detail_pool.cancel_pending()
+
+    def join(self):
+        """等待已投递订单全部完成详情获取并写入存储"""
+        self.detail_pool.join()
+        self.storage_queue.join()
+
+    def shutdown(self):
+        self.detail_pool.shutdown()
+        if self._writer_thread is not None:
+            self.storage_queue.put(_STOP)
+            self._writer_thread.join()
+            self._writer_thread = None
@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from detail_cache import resolve_data_path
+from utils import logger
+
+
+class HighWaterMarkStore:
+    """按account_id保存已完整爬取并写入的最新订单createTime（毫秒），用于增量爬取"""
+
+    def __init__(self, path):
+        self.path = resolve_data_path(path)
+        self._lock = threading.Lock()
+
+    def _load_locked(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except Exception as e:
+            logger.warning(f"读取增量爬取水位文件失败: {str(e)}")
+            return {}
+
+    def get(self, account_id):
+        """返回该账号的水位（毫秒时间戳），没有记录时返回None"""
+        with self._lock:
+            entry = self._load_locked().get(str(account_id))
+        if not entry:
+            return None
+        try:
+            return int(entry.get('create_time'))
+        except (TypeError, ValueError):
+            return None
+
+    def update(self, account_id, create_time):
+        """水位只前进不后退，返回更新后的水位"""
+        with self._lock:
+            data = self._load_locked()
+            entry = data.get(str(account_id)) or {}
+            current = entry.get('create_time')
+            if current is not None and int(current) >= int(create_time):
+                return int(current)
+            data[str(account_id)] = {'create_time': int(create_time), 'updated_at': time.time()}
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+            os.replace(temp_path, self.path)
+            return int(create_time)
+
+
+def crawl_checkpoint_key(*parts):
+    """由账号、时间范围、结算状态等参数生成检查点标识"""
+    payload = json.dumps([str(part) for part in parts], ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class CrawlCheckpoint:
+    """可断点续爬的检查点：每个窗口记录下一个需要爬取的页码，并追加记录已交给存储的订单号
+
+    由两个文件组成：<key>.json（窗口列表和各窗口进度，页有变化时整体重写）和
+    <key>.orders（每行一个已写入的订单号，只追加）。只有一页的订单全部写入存储后，
+    该窗口的续爬页码才会越过这一页，因此崩溃时仍在流水线中的订单会在续爬时重新获取。
+    """
+
+    def __init__(self, directory, key):
+        self.key = key
+        self.header_path = resolve_data_path(os.path.join(directory, f"{key}.json"))
+        self.orders_path = os.path.join(os.path.dirname(self.header_path), f"{key}.orders")
+        self.windows = []
+        self.stored_order_nos = set()
+        self.resumed = False
+        self._progress = {}
+        self._pending_pages = {}
+        self._order_pages = {}
+        # 未完成页的列表统计：window_id -> {页码: (列表订单数, 最新createTime)}，页完成后累加到进度中
+        self._page_stats = {}
+        self._orders_file = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _window_id(window):
+        return f"{window[0]}-{window[1]}"
+
+    def load(self):
+        """读取已有检查点，存在时返回True"""
+        if not os.path.exists(self.header_path):
+            return False
+        try:
+            with open(self.header_path, 'r', encoding='utf-8') as f:
+                header = json.load(f)
+            self.windows = [tuple(window) for window in header.get('windows', [])]
+            self._progress = header.get('progress', {})
+            if os.path.exists(self.orders_path):
+                with open(self.orders_path, 'r', encoding='utf-8') as f:
+                    self.stored_order_nos = {line.strip() for line in f if line.strip()}
+        except Exception as e:
+            logger.warning(f"读取爬取检查点失败，将从头开始爬取: {str(e)}")
+            self.windows = []
+            self._progress = {}
+            self.stored_order_nos = set()
+            return False
+        self.resumed = bool(self.windows)
+        return self.resumed
+
+    def start(self, windows):
+        """开始（或继续）爬取，新检查点写入窗口列表"""
+        with self._lock:
+            if not self.resumed:
+                self.windows = [tuple(window) for window in windows]
+                self._progress = {}
+                self._write_header_locked()
+            self._orders_file = open(self.orders_path, 'a', encoding='utf-8', buffering=1)
+
+    def completed_listing(self):
+        """已完成的页的列表统计：(列表订单数, 最新createTime, {窗口: 订单总数})"""
+        with self._lock:
+            listed_count = 0
+            max_create_time = None
+            totals = {}
+            for window in self.windows:
+                entry = self._progress.get(self._window_id(window)) or {}
+                listed_count += entry.get('listed', 0)
+                create_time = entry.get('max_create_time')
+                if create_time is not None and (max_create_time is None or create_time > max_create_time):
+                    max_create_time = create_time
+                if entry.get('total'):
+                    totals[window] = entry['total']
+            return listed_count, max_create_time, totals
+
+    def all_windows_done(self):
+        return all(self.is_window_done(window) for window in self.windows)
+
+    def start_page(self, window):
+        entry = self._progress.get(self._window_id(window)) or {}
+        return max(1, int(entry.get('next_page', 1)))
+
+    def is_window_done(self, window):
+        return bool((self._progress.get(self._window_id(window)) or {}).get('done'))
+
+    def page_listed(self, window, page_number, order_nos, total=None, pages=None, listed_count=0, max_create_time=None):
+        """记录一页列表中交给详情/存储的订单，这些订单全部写入后该页才算完成
+
+        listed_count/max_create_time为该页列表的订单数和最新createTime，页完成后计入窗口进度，续爬时用于推进增量水位。
+        """
+        window_id = self._window_id(window)
+        with self._lock:
+            entry = self._progress.setdefault(window_id, {'next_page': page_number, 'done': False})
+            if total:
+                entry['total'] = total
+            if pages:
+                entry['pages'] = pages
+            pending = set()
+            for order_no in order_nos:
+                if order_no in self.stored_order_nos or order_no in self._order_pages:
+                    continue
+                pending.add(order_no)
+                self._order_pages[order_no] = (window_id, page_number)
+            self._pending_pages.setdefault(window_id, {})[page_number] = pending
+            self._page_stats.setdefault(window_id, {})[page_number] = (listed_count, max_create_time)
+            self._advance_locked(window_id)
+
+    def window_listing_finished(self, window, last_page):
+        """窗口已翻到最后一页，last_page之后没有需要爬取的页"""
+        window_id = self._window_id(window)
+        with self._lock:
+            entry = self._progress.setdefault(window_id, {'next_page': 1, 'done': False})
+            entry['last_page'] = last_page
+            self._advance_locked(window_id)
+
+    def page_empty(self, window, page_number):
+        """列表返回空页：已知总页数且该页未超出时视为请求失败，不结束窗口"""
+        entry = self._progress.get(self._window_id(window)) or {}
+        if entry.get('pages') and page_number <= entry['pages']:
+            return
+        self.window_listing_finished(window, page_number - 1)
+
+    def order_stored(self, order_no):
+        with self._lock:
+            if not order_no or order_no in self.stored_order_nos:
+                return
+            self.stored_order_nos.add(order_no)
+            if self._orders_file is not None:
+                self._orders_file.write(f"{order_no}\n")
+            location = self._order_pages.pop(order_no, None)
+            if location is None:
+                return
+            window_id, page_number = location
+            pending = self._pending_pages.get(window_id, {}).get(page_number)
+            if pending is not None:
+                pending.discard(order_no)
+                self._advance_locked(window_id)
+
+    def _advance_locked(self, window_id):
+        entry = self._progress[window_id]
+        pages = self._pending_pages.get(window_id, {})
+        changed = False
+        while entry['next_page'] in pages and not pages[entry['next_page']]:
+            del pages[entry['next_page']]
+            listed_count, max_create_time = self._page_stats.get(window_id, {}).pop(entry['next_page'], (0, None))
+            entry['listed'] = entry.get('listed', 0) + listed_count
+            if max_create_time is not None and max_create_time > entry.get('max_create_time', max_create_time - 1):
+                entry['max_create_time'] = max_create_time
+            entry['next_page'] += 1
+            changed = True
+        last_page = entry.get('last_page')
+        if not entry['done'] and last_page is not None and entry['next_page'] > last_page:
+            entry['done'] = True
+            changed = True
+        if changed:
+            self._write_header_locked()
+
+    def _write_header_locked(self):
+        header = {
+            'key': self.key,
+            'windows': [list(window) for window in self.windows],
+            'progress': self._progress,
+            'updated_at': time.time(),
+        }
+        temp_path = f"{self.header_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(header, f, ensure_ascii=False)
+        os.replace(temp_path, self.header_path)
+
+    def close(self):
+        with self._lock:
+            if self._orders_file is not None:
+                self._orders_file.close()
+                self._orders_file = None
+
+    def clear(self):
+        """爬取完整结束后删除检查点"""
+        self.close()
+        for path in (self.header_path, self.orders_path):
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                logger.warning(f"删除爬取检查点失败: {str(e)}")
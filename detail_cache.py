@@ -0,0 +1,172 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from utils import logger
+
+# 终态状态值的白名单（不区分大小写），需按接口实际返回的枚举值通过DETAIL_CACHE_FINAL_STATUSES配置；
+# 默认为空：没有确认过的状态一律按非终态处理，缓存DETAIL_CACHE_TTL秒后过期
+DEFAULT_FINAL_STATUSES = ()
+
+# parse_detail_data输出中的状态字段
+STATUS_FIELDS = ('Order Information_Status', 'Settlement Information_Settlement Status')
+
+
+def resolve_data_path(path):
+    """相对路径按当前工作目录解析，并确保所在目录存在"""
+    if not os.path.isabs(path):
+        path = os.path.join(os.getcwd(), path)
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+    return path
+
+
+class DetailCache:
+    """订单详情本地缓存（SQLite），以(order_no, order_type)为键保存parse_detail_data的结果
+
+    终态订单的缓存永不过期，其他订单的缓存超过ttl_seconds后失效；只有详情中出现的状态字段全部在
+    final_statuses白名单中才算终态，无法识别的状态按非终态处理，避免进行中的订单被永久缓存。
+    条目数超过max_entries时优先淘汰非终态、其次是最久未访问的条目。
+    命中时的访问时间先记在内存中，累计TOUCH_FLUSH_INTERVAL条、淘汰前或调用flush()时批量写回，命中本身不写库。
+    """
+
+    # 每写入多少条检查一次容量
+    EVICT_CHECK_INTERVAL = 100
+    # 累计多少条命中后批量写回访问时间
+    TOUCH_FLUSH_INTERVAL = 500
+
+    def __init__(self, path, ttl_seconds=3600, max_entries=200000, final_statuses=DEFAULT_FINAL_STATUSES):
+        self.path = resolve_data_path(path)
+        self.ttl_seconds = max(0, float(ttl_seconds))
+        self.max_entries = max(1, int(max_entries))
+        self.final_statuses = {str(status).strip().lower() for status in final_statuses if str(status).strip()}
+        self._lock = threading.Lock()
+        self._puts_since_check = 0
+        # 尚未写回的访问时间：{(order_no, order_type): accessed_at}
+        self._touched = {}
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'stores': 0, 'evictions': 0}
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS detail_cache ('
+            'order_no TEXT NOT NULL, order_type TEXT NOT NULL, detail TEXT NOT NULL, '
+            'is_final INTEGER NOT NULL, expires_at REAL, accessed_at REAL NOT NULL, '
+            'PRIMARY KEY (order_no, order_type))'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_detail_cache_evict ON detail_cache (is_final, accessed_at)')
+        self._conn.commit()
+
+    def is_final(self, detail):
+        values = [str(detail.get(field)).strip().lower() for field in STATUS_FIELDS if detail.get(field) not in (None, '')]
+        return bool(values) and all(value in self.final_statuses for value in values)
+
+    def get(self, order_no, order_type, allow_expired=False):
+        """命中时返回详情字典（每次返回新对象），未命中或已过期返回None
+
+        allow_expired为True时已过期的条目也返回（列表行显示订单没有变化时使用）。
+        """
+        key = (str(order_no), str(order_type or ''))
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT detail, expires_at FROM detail_cache WHERE order_no = ? AND order_type = ?', key
+            ).fetchone()
+            if row is None:
+                self._stats['misses'] += 1
+                return None
+            detail, expires_at = row
+            if expires_at is not None and expires_at <= now and not allow_expired:
+                self._conn.execute('DELETE FROM detail_cache WHERE order_no = ? AND order_type = ?', key)
+                self._conn.commit()
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= self.TOUCH_FLUSH_INTERVAL:
+                self._flush_touched_locked()
+                self._conn.commit()
+            self._stats['hits'] += 1
+        return json.loads(detail)
+
+    def put(self, order_no, order_type, detail):
+        if not detail:
+            return
+        now = time.time()
+        is_final = self.is_final(detail)
+        expires_at = None if is_final else now + self.ttl_seconds
+        key = (str(order_no), str(order_type or ''))
+        with self._lock:
+            self._touched.pop(key, None)
+            self._conn.execute(
+                'INSERT OR REPLACE INTO detail_cache (order_no, order_type, detail, is_final, expires_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                key + (json.dumps(detail, ensure_ascii=False), int(is_final), expires_at, now),
+            )
+            self._stats['stores'] += 1
+            self._puts_since_check += 1
+            if self._puts_since_check >= self.EVICT_CHECK_INTERVAL:
+                self._puts_since_check = 0
+                self._evict_locked()
+            self._conn.commit()
+
+    def invalidate(self, order_no, order_type):
+        """删除指定订单的缓存（列表行显示订单状态已变化时调用）"""
+        with self._lock:
+            self._conn.execute(
+                'DELETE FROM detail_cache WHERE order_no = ? AND order_type = ?', (str(order_no), str(order_type or ''))
+            )
+            self._conn.commit()
+
+    def _flush_touched_locked(self):
+        if not self._touched:
+            return
+        self._conn.executemany(
+            'UPDATE detail_cache SET accessed_at = ? WHERE order_no = ? AND order_type = ?',
+            [(accessed_at,) + key for key, accessed_at in self._touched.items()],
+        )
+        self._touched = {}
+
+    def flush(self):
+        """把内存中的访问时间写回数据库"""
+        with self._lock:
+            self._flush_touched_locked()
+            self._conn.commit()
+
+    def _evict_locked(self):
+        # 先写回访问时间，保证按最近访问时间淘汰
+        self._flush_touched_locked()
+        count = self._conn.execute('SELECT COUNT(*) FROM detail_cache').fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow <= 0:
+            return
+        self._conn.execute(
+            'DELETE FROM detail_cache WHERE rowid IN ('
+            'SELECT rowid FROM detail_cache ORDER BY is_final ASC, accessed_at ASC LIMIT ?)',
+            (overflow,),
+        )
+        self._stats['evictions'] += overflow
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def log_stats(self):
+        stats = self.stats()
+        logger.info(
+            f"[详情缓存] 命中 {stats['hits']} 次，未命中 {stats['misses']} 次（其中过期 {stats['expired']} 次），"
+            f"命中率 {stats['hit_rate']:.1%}，写入 {stats['stores']} 条，淘汰 {stats['evictions']} 条"
+        )
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._flush_touched_locked()
+            self._conn.commit()
+            self._conn.close()
@@ -0,0 +1,103 @@
+import datetime
+import time
+
+# 详情中的时间戳按西非时间（UTC+1）格式化
+WAT_OFFSET_SECONDS = 3600
+# gmtime快速路径只处理datetime可表示的范围（9999年以内），其余交给datetime按原逻辑处理
+FAST_FORMAT_MAX_SECONDS = 253402300799 - WAT_OFFSET_SECONDS
+WAT_TZ = datetime.timezone(datetime.timedelta(seconds=WAT_OFFSET_SECONDS))
+
+USER_MOBILE_COLUMN = 'user_mobile_no'
+USER_MOBILE_TITLE = 'User Mobile No'
+OTHER_INFO_TITLE = 'Other Information'
+
+
+def format_date_value(field_value):
+    """毫秒/秒时间戳转换为西非时间的可读格式，无法转换时原样返回"""
+    if field_value and isinstance(field_value, (int, float)):
+        timestamp = field_value / 1000 if field_value > 1000000000000 else field_value
+        try:
+            seconds = int(timestamp) if 0 <= timestamp <= FAST_FORMAT_MAX_SECONDS else None
+            # 小数部分会被datetime按微秒四舍五入进位到下一秒时，交给datetime处理
+            if seconds is not None and timestamp - seconds < 0.9999995:
+                # 固定时区偏移，直接用gmtime计算，比datetime.fromtimestamp + strftime快数倍
+                return '%04d-%02d-%02d %02d:%02d:%02d' % time.gmtime(seconds + WAT_OFFSET_SECONDS)[:6]
+            return datetime.datetime.fromtimestamp(timestamp, WAT_TZ).strftime('%Y-%m-%d %H:%M:%S')
+        except (OverflowError, OSError, ValueError):
+            pass
+    return field_value
+
+
+class DetailParser:
+    """订单详情响应解析器，输出与逐字段解析完全相同的 列名 -> 值 字典
+
+    每个字段第一次出现时根据信息块/字段的key和title推导列名和值转换函数并缓存，
+    之后同样结构的字段直接查表；只有出现新字段时才走推导流程。
+    fields不为空时只输出其中的列（user_mobile_no在fields中时仍会按原规则从Other Information补齐）。
+    """
+
+    def __init__(self, fields=None):
+        self.fields = frozenset(fields) if fields else None
+        # (block_key, block_title) -> {field_key: (field_title, valueType, 编译结果)}
+        # 编译结果为(列名, 转换函数, 是否User Mobile No, 是否Other Information)，不需要的字段为None
+        self._schema = {}
+        self.schema_misses = 0
+
+    def _compile_field(self, block_key, block_title, field_key, field_title, value_type):
+        self.schema_misses += 1
+        if field_title:
+            column_name = f"{block_title}_{field_title}" if block_title else field_title
+        else:
+            column_name = field_key if field_key else f"{block_key}_field"
+        want_mobile = self.fields is None or USER_MOBILE_COLUMN in self.fields
+        store = self.fields is None or column_name in self.fields
+        is_mobile = want_mobile and field_title == USER_MOBILE_TITLE
+        is_other = want_mobile and block_title == OTHER_INFO_TITLE
+        if not (store or is_mobile or is_other):
+            return None
+        converter = format_date_value if value_type == 'date' else None
+        return column_name if store else None, converter, is_mobile, is_other
+
+    def parse(self, detail_response):
+        parsed_data = {}
+        other_info_values = []
+
+        if not detail_response or detail_response.get('respCode') != '00000000':
+            return parsed_data
+
+        for info_block in detail_response.get('data', []):
+            block_key = info_block.get('key', '')
+            block_title = info_block.get('title', '')
+            block_schema = self._schema.get((block_key, block_title))
+            if block_schema is None:
+                block_schema = self._schema[(block_key, block_title)] = {}
+            for field in info_block.get('value', []):
+                field_key = field.get('key', '')
+                field_title = field.get('title', '')
+                value_type = field.get('valueType', '')
+                cached = block_schema.get(field_key)
+                if cached is not None and cached[0] == field_title and cached[1] == value_type:
+                    compiled = cached[2]
+                else:
+                    # 新字段（或同一key的title/类型变化）：推导列名和转换函数
+                    compiled = self._compile_field(block_key, block_title, field_key, field_title, value_type)
+                    block_schema[field_key] = (field_title, value_type, compiled)
+                if compiled is None:
+                    continue
+
+                column_name, converter, is_mobile, is_other = compiled
+                field_value = field.get('value', '')
+                if converter is not None:
+                    field_value = converter(field_value)
+                if column_name is not None:
+                    parsed_data[column_name] = field_value
+                if is_mobile:
+                    parsed_data[USER_MOBILE_COLUMN] = field_value
+                if is_other and field_value:
+                    other_info_values.append(field_value)
+
+        # 如果没有找到User Mobile No，将Other Information中的所有值合并后填到user_mobile_no
+        if USER_MOBILE_COLUMN not in parsed_data and other_info_values:
+            parsed_data[USER_MOBILE_COLUMN] = ' | '.join(other_info_values)
+
+        return parsed_data
@@ -0,0 +1,91 @@
+import queue
+import threading
+
+from colorama import Fore
+
+from utils import logger
+
+# 通知工作线程退出的哨兵
+_STOP = object()
+
+
+class DetailWorkerPool:
+    """常驻的订单详情工作线程池，整个爬取过程共用一组线程，从队列中消费列表订单（含order_no、order_type）"""
+
+    def __init__(self, fetch_func, result_callback, max_workers=5, queue_size=0, name='detail-worker'):
+        self.fetch_func = fetch_func
+        self.result_callback = result_callback
+        self.max_workers = max(1, int(max_workers))
+        self.name = name
+        self.tasks = queue.Queue(maxsize=max(0, int(queue_size)))
+        self._threads = []
+        self._started = False
+
+    def start(self):
+        if self._started:
+            return self
+        for index in range(self.max_workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"{self.name}-{index + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._started = True
+        logger.info(f"订单详情工作线程池已启动，worker数: {self.max_workers}")
+        return self
+
+    def _worker_loop(self):
+        while True:
+            order = self.tasks.get()
+            try:
+                if order is _STOP:
+                    return
+                try:
+                    result = self.fetch_func(order)
+                except Exception as e:
+                    print(Fore.RED + f"获取订单 {order.get('order_no', '')} 详情时出错: {str(e)}")
+                    logger.error(f"获取订单 {order.get('order_no', '')} 详情时出错: {str(e)}")
+                    result = order  # 即使出错也交付原始订单数据
+                try:
+                    self.result_callback(result)
+                except Exception as e:
+                    print(Fore.RED + f"处理订单 {order.get('order_no', '')} 详情结果时出错: {str(e)}")
+                    logger.error(f"处理订单 {order.get('order_no', '')} 详情结果时出错: {str(e)}")
+            finally:
+                self.tasks.task_done()
+
+    def submit(self, order):
+        """提交一个订单，队列满时阻塞"""
+        self.tasks.put(order)
+
+    def pending_count(self):
+        return self.tasks.qsize()
+
+    def cancel_pending(self):
+        """丢弃尚未开始处理的订单（用于停止爬取）"""
+        cancelled = 0
+        while True:
+            try:
+                order = self.tasks.get_nowait()
+            except queue.Empty:
+                break
+            if order is _STOP:
+                self.tasks.put_nowait(order)
+                self.tasks.task_done()
+                break
+            self.tasks.task_done()
+            cancelled += 1
+        return cancelled
+
+    def join(self):
+        """等待所有已提交的订单处理完成"""
+        self.tasks.join()
+
+    def shutdown(self, wait=True):
+        if not self._started:
+            return
+        for _ in self._threads:
+            self.tasks.put(_STOP)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self._threads = []
+        self._started = False
@@ -0,0 +1,113 @@
+import http.cookiejar
+import ssl
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from utils import logger
+
+
+class _ConnectionCounter:
+    """统计经由连接池发出的请求数和新建的TCP连接数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+
+    def add_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def add_connection(self):
+        with self._lock:
+            self.new_connections += 1
+
+
+def _counting_pool_class(base_class, counter):
+    """生成在新建连接时计数的连接池类"""
+
+    class CountingConnectionPool(base_class):
+        def _new_conn(self):
+            counter.add_connection()
+            return super()._new_conn()
+
+    return CountingConnectionPool
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """复用同一个SSL上下文的连接池适配器，并统计新建连接数"""
+
+    def __init__(self, pool_size, counter, ssl_context=None):
+        self.counter = counter
+        self.ssl_context = ssl_context
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        if self.ssl_context is not None:
+            pool_kwargs.setdefault('ssl_context', self.ssl_context)
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _counting_pool_class(HTTPConnectionPool, self.counter),
+            'https': _counting_pool_class(HTTPSConnectionPool, self.counter),
+        }
+
+
+class HttpTransport:
+    """Palmpay API共用的keep-alive HTTP传输层
+
+    所有线程共用一个requests.Session，连接池大小与详情并发数匹配，TCP/TLS连接在请求之间复用；
+    不保存服务端下发的cookie，每次请求的头部仍完全由调用方决定，与直接调用requests.post/get一致。
+    """
+
+    def __init__(self, pool_size=10, timeout=30):
+        self.pool_size = max(1, int(pool_size))
+        self.timeout = timeout
+        self.counter = _ConnectionCounter()
+        # 所有连接共用一个SSL上下文，避免每个连接重复加载CA证书
+        self.ssl_context = ssl.create_default_context(cafile=requests.certs.where())
+        self.session = requests.Session()
+        self.session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+        adapter = PooledHTTPAdapter(self.pool_size, self.counter, ssl_context=self.ssl_context)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        self.counter.add_request()
+        return self.session.request(method, url, **kwargs)
+
+    def post(self, url, json=None, headers=None, timeout=None):
+        return self.request('POST', url, json=json, headers=headers, timeout=timeout or self.timeout)
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        return self.request('GET', url, params=params, headers=headers, timeout=timeout or self.timeout)
+
+    def stats(self):
+        """连接复用统计：请求数、新建连接数、复用连接的请求数及复用率"""
+        requests_count = self.counter.requests
+        new_connections = self.counter.new_connections
+        reused = max(0, requests_count - new_connections)
+        return {
+            'pool_size': self.pool_size,
+            'requests': requests_count,
+            'new_connections': new_connections,
+            'reused_connections': reused,
+            'reuse_rate': reused / requests_count if requests_count else 0.0,
+        }
+
+    def log_stats(self, add_log=None):
+        stats = self.stats()
+        summary = (
+            f"[连接池] 请求 {stats['requests']} 次，新建连接 {stats['new_connections']} 个，"
+            f"复用 {stats['reused_connections']} 次（复用率 {stats['reuse_rate']:.1%}，连接池上限 {stats['pool_size']}）"
+        )
+        logger.info(summary)
+        if add_log:
+            add_log(summary, 'cyan')
+        return stats
+
+    def close(self):
+        self.session.close()
@@ -3,15 +3,17 @@ import threading
 import subprocess
 import sys
 import os
-import json
 from colorama import init, Fore
 from dotenv import load_dotenv
 from browser_manager import BrowserManager
 from api_crawler import APICrawler
+from async_crawler import AsyncAPICrawler
 from storage import Storage
 from utils import logger, ErrorHandler
 from qt_gui import QtGUIServer
 from browser_thread import BrowserOperationThread
+from auth_store import auth_store
+from order_rows import order_to_dict
 
 init(autoreset=True)
 
@@ -29,9 +31,7 @@ def load_config():
     config_path = os.path.join(base_dir, 'config.json')
     if os.path.exists(config_path):
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            return config
+            return auth_store.load(config_path)
         except Exception as e:
             logger.error(f"加载配置文件失败: {str(e)}")
     return {
@@ -307,8 +307,10 @@ class PalmpayCrawler:
         print(Fore.CYAN + "启动爬虫程序...")
         
         try:
-            # 创建初始爬虫实例（无浏览器）
-            self.crawler = APICrawler(self.browser_manager, self.gui_server, self.storage)
+            # 创建初始爬虫实例（无浏览器），CRAWL_ENGINE=async 时使用asyncio爬取引擎
+            crawl_engine = (os.getenv('CRAWL_ENGINE') or 'thread').strip().lower()
+            crawler_class = AsyncAPICrawler if crawl_engine == 'async' else APICrawler
+            self.crawler = crawler_class(self.browser_manager, self.gui_server, self.storage)
             # 将browser_thread赋值给crawler，以便在token过期时获取新的认证信息
             self.crawler.browser_thread = self.browser_thread
             self.crawler.add_log("=== Palmpay商户后台爬虫 ===", 'info')
@@ -422,8 +424,10 @@ class PalmpayCrawler:
                 end_timestamp = getattr(self, 'end_timestamp', None)
                 settlement_status = getattr(self, 'settlement_status', None)
                 
-                # 调用API获取订单数据
-                order_data = self.crawler.crawl_orders_by_api(start_timestamp, end_timestamp, settlement_status=settlement_status, stop_event=self.stop_crawler_event)
+                # 流式获取订单数据：订单已实时写入存储，这里只计数，不在内存中保留订单
+                stored_count = 0
+                for _ in self.crawler.iter_orders_by_api(start_timestamp, end_timestamp, settlement_status=settlement_status, stop_event=self.stop_crawler_event):
+                    stored_count += 1
                 
                 # 检查是否被停止
                 if self.stop_crawler_event.is_set():
@@ -431,15 +435,11 @@ class PalmpayCrawler:
                     self.gui_server.add_log("爬虫任务被用户停止", 'yellow')
                     return
                 
-                # 确保order_data是一个列表
-                if not isinstance(order_data, list):
-                    order_data = []
-                
                 # 打印订单数据信息
-                print(Fore.GREEN + f"爬取完成，共获取 {len(order_data)} 条订单数据")
-                self.gui_server.add_log(f"爬取完成，共获取 {len(order_data)} 条订单数据", 'green')
+                print(Fore.GREEN + f"爬取完成，共获取 {stored_count} 条订单数据")
+                self.gui_server.add_log(f"爬取完成，共获取 {stored_count} 条订单数据", 'green')
                 
-                if not order_data:
+                if not stored_count:
                     self.gui_server.add_log("未获取到订单数据", 'yellow')
                     print(Fore.YELLOW + "未获取到订单数据")
                 
@@ -563,6 +563,8 @@ class PalmpayCrawler:
             if self.storage and hasattr(self.storage, 'get_sink_label'):
                 sink_label = self.storage.get_sink_label()
             # 存储到当前目标
+            # 列表行在存储边界转换为字典
+            order_data = [order_to_dict(order) for order in order_data]
             if self.storage.save_to_db(order_data, auth_info=getattr(self.crawler, 'auth_info', None)):
                 logger.info(f"导出完成，共获取 {len(order_data)} 条订单数据")
                 print(Fore.GREEN + f"导出完成，数据已写入{sink_label}！")
@@ -0,0 +1,68 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from detail_cache import resolve_data_path
+
+# 列表接口已返回、且会随订单状态变化的字段
+FINGERPRINT_FIELDS = ('order_status', 'settlement_status', 'settlement_amount', 'settlement_time', 'order_amount')
+
+
+def order_fingerprint(order):
+    """根据列表行中的状态/金额字段计算指纹"""
+    values = [order.get(field, '') for field in FINGERPRINT_FIELDS]
+    payload = json.dumps(values, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class OrderFingerprintStore:
+    """本地保存每个订单上一次推送成功时的列表行指纹（SQLite），用于跳过未变化订单的详情请求"""
+
+    def __init__(self, path):
+        self.path = resolve_data_path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS order_fingerprints ('
+            'order_no TEXT NOT NULL, order_type TEXT NOT NULL, fingerprint TEXT NOT NULL, updated_at REAL NOT NULL, '
+            'PRIMARY KEY (order_no, order_type))'
+        )
+        self._conn.commit()
+
+    def get(self, order_no, order_type):
+        """返回上次写入时保存的指纹，没有记录时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT fingerprint FROM order_fingerprints WHERE order_no = ? AND order_type = ?',
+                (str(order_no), str(order_type or '')),
+            ).fetchone()
+        return row[0] if row else None
+
+    def save(self, order_no, order_type, fingerprint):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO order_fingerprints (order_no, order_type, fingerprint, updated_at) VALUES (?, ?, ?, ?)',
+                (str(order_no), str(order_type or ''), fingerprint, time.time()),
+            )
+            self._conn.commit()
+
+    def save_many(self, entries):
+        """批量保存 (order_no, order_type, fingerprint)，一次提交"""
+        now = time.time()
+        rows = [(str(order_no), str(order_type or ''), fingerprint, now) for order_no, order_type, fingerprint in entries]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO order_fingerprints (order_no, order_type, fingerprint, updated_at) VALUES (?, ?, ?, ?)',
+                rows,
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
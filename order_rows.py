@@ -0,0 +1,88 @@
+class OrderRow:
+    """订单列表接口返回的一行（__slots__，比13个键的字典节省约80%内存）
+
+    支持只读的映射访问（row['order_no']、row.get('order_type', '')、in、keys()），
+    列表/指纹/检查点/详情阶段可以直接使用；只有交给存储时才通过to_dict()转换为字典。
+    """
+
+    __slots__ = (
+        'order_no', 'order_type', 'order_status', 'order_amount', 'create_time',
+        'settlement_status', 'settlement_amount', 'settlement_time', 'country_code',
+        'merchant_id', 'pay_id', 'out_order_no', 'user_mobile_no',
+    )
+
+    def __init__(self, item):
+        get = item.get
+        self.order_no = get('orderNo', '')
+        self.order_type = get('orderType', '')
+        self.order_status = get('orderStatus', '')
+        self.order_amount = get('orderAmount', '')
+        self.create_time = get('createTime', '')
+        self.settlement_status = get('settlementStatus', '')
+        self.settlement_amount = get('settlementAmount', '')
+        self.settlement_time = get('settlementTime', '')
+        self.country_code = get('countryCode', '')
+        self.merchant_id = get('merchantId', '')
+        self.pay_id = get('payId', '')
+        self.out_order_no = get('outOrderNo', '')
+        self.user_mobile_no = get('payerAccountNo', '')  # 从订单列表中获取用户手机号
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        if key not in self.__slots__:
+            return default
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def keys(self):
+        return self.__slots__
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def to_dict(self):
+        return {
+            'order_no': self.order_no,
+            'order_type': self.order_type,
+            'order_status': self.order_status,
+            'order_amount': self.order_amount,
+            'create_time': self.create_time,
+            'settlement_status': self.settlement_status,
+            'settlement_amount': self.settlement_amount,
+            'settlement_time': self.settlement_time,
+            'country_code': self.country_code,
+            'merchant_id': self.merchant_id,
+            'pay_id': self.pay_id,
+            'out_order_no': self.out_order_no,
+            'user_mobile_no': self.user_mobile_no,
+        }
+
+    def __repr__(self):
+        return f"OrderRow(order_no={self.order_no!r}, order_type={self.order_type!r})"
+
+
+class OrderPage(list):
+    """一页订单列表（OrderRow的列表），需要字典时调用to_dicts()"""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_items(cls, items):
+        return cls(OrderRow(item) for item in items)
+
+    def to_dicts(self):
+        return [row.to_dict() for row in self]
+
+
+def order_to_dict(order):
+    """存储边界：列表行转换为字典，详情字典原样返回"""
+    return order.to_dict() if isinstance(order, OrderRow) else order
@@ -0,0 +1,104 @@
+import csv
+import json
+import os
+import sys
+
+from buffered_writer import BufferedFileWriter
+
+
+def value_to_text(value):
+    """CSV单元格文本：None为空，字典/列表转JSON"""
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+class SpoolSegment:
+    """一个存储会话的订单数据段（JSONL，每行一个订单字典）
+
+    只追加、从不改写已写入的行：详情行带来新列时不需要重写历史数据，
+    每行保留自己的字段和原始类型；需要人工查看时再用export_spool_to_csv导出。
+    """
+
+    def __init__(self, path, flush_rows=100, flush_interval_ms=1000, fsync=False):
+        self.path = path
+        self.row_count = 0
+        self._file = BufferedFileWriter(
+            path,
+            encoding='utf-8',
+            newline='\n',
+            flush_rows=flush_rows,
+            flush_interval_ms=flush_interval_ms,
+            fsync=fsync,
+        )
+
+    def append(self, rows):
+        for row in rows:
+            self._file.write(json.dumps(row, ensure_ascii=False, default=str) + '\n')
+        self.row_count += len(rows)
+        self._file.rows_written(len(rows))
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def iter_spool_rows(path):
+    """逐行读取数据段；进程崩溃时可能残留不完整的最后一行，跳过"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.endswith('\n'):
+                break
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def export_spool_to_csv(spool_paths, csv_path, to_text=value_to_text):
+    """把一个或多个数据段导出为CSV，表头为所有行字段的并集（按首次出现的顺序）
+
+    读两遍数据段：第一遍收集表头，第二遍逐行写出，内存中不保留订单数据。
+    """
+    if isinstance(spool_paths, str):
+        spool_paths = [spool_paths]
+
+    headers = {}
+    for spool_path in spool_paths:
+        for row in iter_spool_rows(spool_path):
+            for key in row:
+                if key not in headers:
+                    headers[key] = None
+    headers = list(headers)
+
+    row_count = 0
+    temp_path = f"{csv_path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=headers)
+        if headers:
+            writer.writeheader()
+        for spool_path in spool_paths:
+            for row in iter_spool_rows(spool_path):
+                writer.writerow({h: to_text(row.get(h, '')) for h in headers})
+                row_count += 1
+    os.replace(temp_path, csv_path)
+    return row_count
+
+
+def default_csv_path(spool_path):
+    root, _ = os.path.splitext(spool_path)
+    return root + '.csv'
+
+
+if __name__ == '__main__':
+    # 用法: python order_spool.py data/xxx_order_details.jsonl [输出.csv]
+    if len(sys.argv) < 2:
+        print("用法: python order_spool.py <数据段.jsonl> [输出.csv]")
+        sys.exit(1)
+    source = sys.argv[1]
+    target = sys.argv[2] if len(sys.argv) > 2 else default_csv_path(source)
+    count = export_spool_to_csv(source, target)
+    print(f"已导出 {count} 条订单到 {target}")
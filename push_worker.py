@@ -0,0 +1,121 @@
+import queue
+import threading
+import time
+
+from colorama import Fore
+
+
+class PushJob:
+    """一个待推送批次，对应已关闭数据段中从row_start开始的row_count行
+
+    payloads为None表示内存缓冲已释放，推送时从数据段重放；sent为已推送成功的行数，推送成功后等于row_count。
+    """
+
+    __slots__ = ('spool_path', 'payloads', 'row_start', 'row_count', 'order_nos', 'account_info', 'sent', 'created_at')
+
+    def __init__(self, spool_path, payloads, row_start, row_count, account_info, order_nos=()):
+        self.spool_path = spool_path
+        self.payloads = payloads
+        self.row_start = row_start
+        self.row_count = row_count
+        self.order_nos = list(order_nos)
+        self.account_info = account_info
+        self.sent = 0
+        self.created_at = time.monotonic()
+
+    @property
+    def pending_rows(self):
+        return self.row_count - self.sent
+
+
+class PushWorker:
+    """后台推送线程池：workers个线程从有界队列取出批次调用push_job(job)推送，最多workers个批次同时在途
+
+    队列满时submit阻塞调用方形成背压；push_job返回False表示批次推送失败，由调用方保留重试。
+    """
+
+    def __init__(self, push_job, queue_size=2, workers=1, name='storage-push'):
+        self._push_job = push_job
+        self.queue_size = max(1, int(queue_size))
+        self.workers = max(1, int(workers))
+        self.name = name
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._lock = threading.Lock()
+        self._threads = []
+        # 已提交、尚未处理完的批次，用于计算推送延迟
+        self._outstanding = {}
+        self.pushed_jobs = 0
+        self.pushed_rows = 0
+        self.failed_jobs = 0
+        self.last_latency = 0.0
+
+    def _ensure_started(self):
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            for index in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._run, name=f"{self.name}-{index + 1}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, job):
+        """提交批次，队列满时阻塞直到后台线程取走"""
+        self._ensure_started()
+        with self._lock:
+            self._outstanding[id(job)] = job
+        self._queue.put(job)
+
+    def wait_idle(self):
+        """等待已提交的批次全部处理完"""
+        if self._threads:
+            self._queue.join()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                pending_rows = job.pending_rows
+                try:
+                    ok = self._push_job(job)
+                except Exception as e:
+                    print(Fore.RED + f"后台推送异常: {str(e)}")
+                    ok = False
+                with self._lock:
+                    self._outstanding.pop(id(job), None)
+                    if ok:
+                        self.pushed_jobs += 1
+                        self.pushed_rows += pending_rows
+                        self.last_latency = time.monotonic() - job.created_at
+                    else:
+                        self.failed_jobs += 1
+            finally:
+                self._queue.task_done()
+
+    def stats(self):
+        """推送队列深度、在途批次、最久未完成批次的等待时间（推送延迟）及累计结果"""
+        now = time.monotonic()
+        with self._lock:
+            outstanding = list(self._outstanding.values())
+            return {
+                'queue_depth': self._queue.qsize(),
+                'queue_max': self.queue_size,
+                'workers': self.workers,
+                'outstanding_jobs': len(outstanding),
+                'outstanding_rows': sum(job.pending_rows for job in outstanding),
+                'push_lag': max((now - job.created_at for job in outstanding), default=0.0),
+                'last_latency': self.last_latency,
+                'pushed_jobs': self.pushed_jobs,
+                'pushed_rows': self.pushed_rows,
+                'failed_jobs': self.failed_jobs,
+            }
+
+    def stop(self, timeout=None):
+        """处理完队列中的批次后结束全部后台线程"""
+        with self._lock:
+            threads = [thread for thread in self._threads if thread.is_alive()]
+            self._threads = []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join(timeout)
@@ -0,0 +1,258 @@
+import email.utils
+import random
+import threading
+import time
+
+import requests
+from colorama import Fore
+
+from utils import logger
+
+SUCCESS_RESP_CODE = '00000000'
+
+# 请求结果分类
+OK = 'ok'
+RETRY = 'retry'
+AUTH_EXPIRED = 'auth_expired'
+FAIL = 'fail'
+
+# 一次尝试处理完后send循环的下一步
+DONE = 'done'
+REFRESH_AUTH = 'refresh_auth'
+BACKOFF = 'backoff'
+
+# respMsg中包含这些关键字时视为服务端繁忙，可以重试
+DEFAULT_BUSY_KEYWORDS = ('busy', 'too many', 'too frequent', 'try again later', 'rate limit', 'system error', '繁忙', '频繁')
+
+
+def is_token_expired_message(error_message):
+    return 'token time out' in error_message or 'token expired' in error_message
+
+
+def parse_retry_after(value):
+    """解析Retry-After头（秒数或HTTP日期），返回需要等待的秒数，无法解析时返回None"""
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class TokenBucket:
+    """全局令牌桶限速（请求/秒），rate<=0表示不限速"""
+
+    def __init__(self, rate=0, burst=None):
+        self.rate = max(0.0, float(rate))
+        self.burst = max(1.0, float(burst if burst else max(1.0, self.rate)))
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.wait_seconds = 0.0
+
+    def reserve(self):
+        """预定一个令牌，返回需要等待的秒数（不阻塞，供同步和异步调用方分别等待）"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            self.wait_seconds += wait
+            return wait
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+
+class RetryPolicy:
+    """按HTTP状态码和respCode划分可重试/不可重试，并计算带抖动的指数退避时间"""
+
+    def __init__(self, max_retries=3, base_delay=0.1, max_delay=10.0, retry_statuses=(429, 503),
+                 busy_resp_codes=(), busy_keywords=DEFAULT_BUSY_KEYWORDS):
+        self.max_retries = max(0, int(max_retries))
+        self.base_delay = max(0.0, float(base_delay))
+        self.max_delay = max(self.base_delay, float(max_delay))
+        self.retry_statuses = set(retry_statuses)
+        self.busy_resp_codes = {str(code).strip() for code in busy_resp_codes if str(code).strip()}
+        self.busy_keywords = tuple(keyword.lower() for keyword in busy_keywords)
+
+    def classify(self, status_code, api_response, error=None):
+        """返回(结果分类, 说明)"""
+        if error is not None:
+            return RETRY, f"请求异常: {error}"
+        if status_code in self.retry_statuses:
+            return RETRY, f"服务器繁忙，状态码: {status_code}"
+        if status_code != 200:
+            return FAIL, f"API请求失败，状态码: {status_code}"
+        if not isinstance(api_response, dict):
+            return FAIL, "解析响应失败"
+        if 'error' in api_response:
+            return FAIL, f"API调用失败: {api_response}"
+
+        resp_code = str(api_response.get('respCode', ''))
+        if resp_code == SUCCESS_RESP_CODE:
+            return OK, ''
+        error_message = api_response.get('respMsg', 'Unknown error') or 'Unknown error'
+        if is_token_expired_message(error_message):
+            return AUTH_EXPIRED, f"API返回错误: {error_message}"
+        lowered = str(error_message).lower()
+        if resp_code in self.busy_resp_codes or any(keyword in lowered for keyword in self.busy_keywords):
+            return RETRY, f"API返回错误: {error_message}"
+        # 其余业务错误（参数错误、订单不存在等）重试也不会成功
+        return FAIL, f"API返回错误: {error_message}"
+
+    def backoff_delay(self, retry_number, retry_after=None):
+        """第retry_number次重试前的等待时间：优先使用Retry-After，否则为带抖动的指数退避"""
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        delay = min(self.max_delay, self.base_delay * (2 ** (retry_number - 1)))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+class SendState:
+    """一次send调用的重试状态"""
+
+    __slots__ = ('retry_number', 'auth_refreshed')
+
+    def __init__(self):
+        self.retry_number = 0
+        self.auth_refreshed = False
+
+
+class RequestEngine:
+    """Palmpay API统一请求入口：限速、重试、Retry-After和token过期刷新集中在这里处理
+
+    首次请求不等待；每次尝试都会调用build_headers重新签名，参数中带时间戳的请求由build_headers负责更新。
+    同步send和异步引擎共用begin_attempt/resolve_attempt，只有发送、等待和刷新认证的方式不同。
+    """
+
+    def __init__(self, transport, rate_limiter=None, policy=None, refresh_auth=None, add_log=None):
+        self.transport = transport
+        self.rate_limiter = rate_limiter or TokenBucket(0)
+        self.policy = policy or RetryPolicy()
+        self.refresh_auth = refresh_auth
+        self.add_log = add_log
+        self._stats_lock = threading.Lock()
+        self._stats = {'requests': 0, 'retries': 0, 'auth_refreshes': 0, 'failures': 0}
+        # 每次尝试完成后的回调：listener(url, 耗时秒数, 结果分类)
+        self.listeners = []
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def notify(self, url, elapsed, outcome):
+        for listener in self.listeners:
+            try:
+                listener(url, elapsed, outcome)
+            except Exception as e:
+                logger.error(f"请求结果回调出错: {str(e)}")
+
+    def record(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def _perform(self, method, url, params, headers):
+        """发送一次请求，返回(状态码, 响应JSON, Retry-After秒数, 异常)"""
+        try:
+            if method == 'POST':
+                response = self.transport.post(url, json=params, headers=headers)
+            else:
+                response = self.transport.get(url, params=params, headers=headers)
+        except requests.exceptions.RequestException as e:
+            return None, None, None, e
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        if response.status_code != 200:
+            return response.status_code, None, retry_after, None
+        try:
+            return response.status_code, response.json(), retry_after, None
+        except ValueError:
+            return response.status_code, None, retry_after, None
+
+    def begin_attempt(self):
+        """记录一次尝试，返回发出时间（time.monotonic()），限速等待由调用方完成"""
+        self.record('requests')
+        return time.monotonic()
+
+    def resolve_attempt(self, state, url, started_at, result, can_refresh=True):
+        """处理一次尝试的结果(状态码, 响应JSON, Retry-After秒数, 异常)，返回(下一步, 值)
+
+        DONE时值为要返回的响应JSON（失败为None）；REFRESH_AUTH表示需要刷新认证信息后立即重试（不计入重试次数），
+        刷新失败时调用方应调用auth_refresh_failed()并返回None；BACKOFF时值为重试前需要等待的秒数。
+        """
+        status_code, api_response, retry_after, error = result
+        outcome, message = self.policy.classify(status_code, api_response, error)
+        self.notify(url, time.monotonic() - started_at, outcome)
+        if outcome == OK:
+            return DONE, api_response
+
+        if outcome == AUTH_EXPIRED and not state.auth_refreshed and can_refresh:
+            self.log_error(message)
+            state.auth_refreshed = True
+            self.record('auth_refreshes')
+            return REFRESH_AUTH, None
+
+        if outcome != RETRY or state.retry_number >= self.policy.max_retries:
+            self.record('failures')
+            self.log_error(f"请求失败，已达到最大重试次数: {message}" if outcome == RETRY else message)
+            return DONE, None
+
+        state.retry_number += 1
+        self.record('retries')
+        delay = self.policy.backoff_delay(state.retry_number, retry_after)
+        logger.warning(f"{message}，{delay:.2f} 秒后第 {state.retry_number} 次重试")
+        return BACKOFF, delay
+
+    def auth_refresh_failed(self):
+        self.record('failures')
+
+    def send(self, method, url, params, build_headers):
+        """发送API请求（POST参数放在body，GET参数放在URL中），成功时返回响应JSON，否则返回None"""
+        state = SendState()
+        while True:
+            self.rate_limiter.acquire()
+            started_at = self.begin_attempt()
+            result = self._perform(method, url, params, build_headers())
+            action, value = self.resolve_attempt(state, url, started_at, result, can_refresh=self.refresh_auth is not None)
+            if action == DONE:
+                return value
+            if action == REFRESH_AUTH:
+                # 传入本次请求的发出时间，请求发出后已有其他线程完成刷新时不再重复刷新
+                if self.refresh_auth(started_at):
+                    continue
+                self.auth_refresh_failed()
+                return None
+            time.sleep(value)
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['rate_limit'] = self.rate_limiter.rate
+        stats['rate_limit_wait_seconds'] = round(self.rate_limiter.wait_seconds, 3)
+        return stats
+
+    def log_stats(self):
+        stats = self.stats()
+        logger.info(
+            f"[请求引擎] 请求 {stats['requests']} 次，重试 {stats['retries']} 次，刷新token {stats['auth_refreshes']} 次，"
+            f"失败 {stats['failures']} 次，限速 {stats['rate_limit'] or '不限'} 次/秒，限速等待 {stats['rate_limit_wait_seconds']} 秒"
+        )
+        return stats
+
+    def log_error(self, message):
+        print(Fore.RED + message)
+        logger.error(message)
+        if self.add_log:
+            self.add_log(message, 'red')
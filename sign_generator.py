@@ -66,59 +66,120 @@ def generate_sign(pp_token, pp_device_id, pp_device_type, pp_client_ver, appsour
     
     return signature, timestamp
 
+# 与test_order_list.py一致的固定签名参数
+APPSOURCE = '30'
+PP_CLIENT_VER = '1.0.0_test&508212014'
+PP_DEVICE_TYPE = 'WEB'
+DEFAULT_MERCHANT_ID = '125072409535231'
+
+
+class SigningContext:
+    """一份认证信息（token、deviceId、merchantid）和请求方法对应的签名上下文
+
+    创建时预先拼好签名消息中的固定部分和请求头模板，每次请求只需填入时间戳、param和签名，
+    结果与generate_sign逐字节一致。GET请求签名的param恒为空字符串，签名只取决于毫秒时间戳，
+    同一毫秒内的请求直接复用上一次的签名。
+    """
+
+    def __init__(self, token, device_id, country_code, method='POST', merchantid=None, header_overrides=None):
+        self.method = method
+        if merchantid is None:
+            merchantid = DEFAULT_MERCHANT_ID
+
+        static_params = {
+            "PP_CLIENT_VER": PP_CLIENT_VER,
+            "PP_DEVICE_ID": device_id,
+            "PP_DEVICE_TYPE": PP_DEVICE_TYPE,
+            "PP_TOKEN": token,
+            "appSource": int(APPSOURCE),
+            "countryCode": country_code.upper(),
+        }
+        # 按generate_sign的排序拼接规则，把消息切成 前缀 + 时间戳 + 中段 + param（param排序固定在最后）
+        self._prefix = ""
+        self._middle = ""
+        after_timestamp = False
+        for key in sorted(list(static_params) + ["PP_TIMESTAMP"]):
+            if key == "PP_TIMESTAMP":
+                self._prefix += key
+                after_timestamp = True
+            elif static_params[key] is not None:
+                if after_timestamp:
+                    self._middle += key + str(static_params[key])
+                else:
+                    self._prefix += key + str(static_params[key])
+        # POST/GET以外的方法不参与param签名
+        self._param_key = "param" if method in ('POST', 'GET') else ""
+
+        self._template = {
+            "accept": "application/json, text/plain, */*",
+            "accept-language": "zh-CN,zh;q=0.9",
+            "appsource": APPSOURCE,
+            "content-type": "application/json",
+            "countrycode": country_code,
+            "merchantid": merchantid,
+            "origin": "https://business.palmpay.com",
+            "pp_client_ver": PP_CLIENT_VER,
+            "pp_device_id": device_id,
+            "pp_device_type": PP_DEVICE_TYPE,
+            "pp_req_sign": "",
+            "pp_req_sign_2": "",
+            "pp_timestamp": "",
+            "pp_token": token,
+            "priority": "u=1, i",
+            "referer": "https://business.palmpay.com/",
+            "sec-ch-ua": 'Not(A:Brand";v="8", "Chromium";v="144", "Google Chrome";v="144"',
+            "sec-ch-ua-mobile": "?0",
+            "sec-ch-ua-platform": "macOS",
+            "sec-fetch-dest": "empty",
+            "sec-fetch-mode": "cors",
+            "sec-fetch-site": "same-site",
+            "tntcode": "palmpayhk",
+            "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36"
+        }
+        if header_overrides:
+            self._template.update(header_overrides)
+        # GET签名缓存：(时间戳, 签名)，整体替换，多线程读写安全
+        self._get_memo = (None, None)
+
+    def sign(self, post_data):
+        """返回(签名, 时间戳)，与generate_sign相同"""
+        if 'timestamp' in post_data:
+            timestamp = str(post_data['timestamp'])
+        else:
+            timestamp = str(int(time.time() * 1000))
+
+        if self.method == 'GET':
+            memo_timestamp, memo_signature = self._get_memo
+            if memo_timestamp == timestamp:
+                return memo_signature, timestamp
+            param = ""
+        elif self.method == 'POST':
+            param = json.dumps(post_data)
+        else:
+            param = ""
+
+        message = self._prefix + timestamp + self._middle + self._param_key + param
+        hmac_key = hashlib.md5(timestamp.encode("utf-8")).hexdigest().encode("utf-8")
+        signature = base64.b64encode(hmac.new(hmac_key, message.encode("utf-8"), hashlib.sha1).digest()).decode("utf-8")
+        if self.method == 'GET':
+            self._get_memo = (timestamp, signature)
+        return signature, timestamp
+
+    def headers(self, params):
+        """复制请求头模板，只填入签名和时间戳"""
+        signature, timestamp = self.sign(params)
+        headers = self._template.copy()
+        headers["pp_req_sign"] = signature
+        headers["pp_req_sign_2"] = signature
+        headers["pp_timestamp"] = timestamp
+        return headers
+
+
 def generate_signature_headers(token, device_id, country_code, params, method='POST', merchantid=None):
     """
-    生成包含签名的请求头
+    生成包含签名的请求头（每次新建签名上下文；高频调用请复用SigningContext）
     """
-    # 使用与test_order_list.py相同的签名生成逻辑
-    appsource = '30'
-    pp_client_ver = '1.0.0_test&508212014'  # 使用与test_order_list.py相同的值
-    
-    # 如果没有提供merchantid，使用默认值
-    if merchantid is None:
-        merchantid = '125072409535231'
-    
-    # 生成签名
-    signature, timestamp = generate_sign(
-        token, 
-        device_id, 
-        'WEB', 
-        pp_client_ver, 
-        appsource, 
-        country_code,
-        params,
-        method
-    )
-    
-    # 构造请求头，与test_order_list.py完全一致
-    headers = {
-        "accept": "application/json, text/plain, */*",
-        "accept-language": "zh-CN,zh;q=0.9",
-        "appsource": appsource,
-        "content-type": "application/json",
-        "countrycode": country_code,
-        "merchantid": merchantid,
-        "origin": "https://business.palmpay.com",
-        "pp_client_ver": pp_client_ver,
-        "pp_device_id": device_id,
-        "pp_device_type": "WEB",
-        "pp_req_sign": signature,
-        "pp_req_sign_2": signature,
-        "pp_timestamp": timestamp,
-        "pp_token": token,
-        "priority": "u=1, i",
-        "referer": "https://business.palmpay.com/",
-        "sec-ch-ua": 'Not(A:Brand";v="8", "Chromium";v="144", "Google Chrome";v="144"',
-        "sec-ch-ua-mobile": "?0",
-        "sec-ch-ua-platform": "macOS",
-        "sec-fetch-dest": "empty",
-        "sec-fetch-mode": "cors",
-        "sec-fetch-site": "same-site",
-        "tntcode": "palmpayhk",
-        "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36"
-    }
-    
-    return headers
+    return SigningContext(token, device_id, country_code, method=method, merchantid=merchantid).headers(params)
 
 if __name__ == '__main__':
     # 测试用例：使用curl请求中的参数
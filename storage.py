@@ -1,4 +1,5 @@
-import csv
+import hashlib
+import itertools
 import json
 import os
 import re
@@ -10,6 +11,9 @@ import requests
 from colorama import Fore, init
 from dotenv import load_dotenv
 
+from order_spool import SpoolSegment, default_csv_path, export_spool_to_csv, iter_spool_rows
+from push_worker import PushJob, PushWorker
+
 init(autoreset=True)
 WAT_TZ = timezone(timedelta(hours=1))
 
@@ -24,16 +28,28 @@ class Storage:
             print(Fore.GREEN + f"创建数据存储目录: {self.data_dir}")
 
         self.write_lock = threading.RLock()  # 使用 RLock 支持同一线程重复获取
-        self.session = requests.Session()
+        # 每个推送线程各用一个Session（requests.Session不保证线程安全），关闭时统一释放
+        self._push_local = threading.local()
+        self._push_sessions = []
         self.conn = None
         self.pymysql = None
         self._last_account_info_api = None
-        self._current_csv_file_path = ''
-        self._current_csv_headers = []
-        self._last_pushed_csv_file_path = ''
+        self._current_spool_path = ''
+        self._spool = None  # 当前会话常驻打开的数据段写入器
+        self._last_pushed_spool_path = ''
+        # 当前数据段中待推送订单的接口payload；数据段只作为持久化日志，正常推送不再回读
+        self._pending_payloads = []
+        self._pending_overflow = False  # 缓冲超过上限后丢弃内存payload，推送时从数据段重放
+        self._pending_order_nos = []  # 与数据段行一一对应，推送成功后通知送达
+        self._delivery_listeners = []
         self._api_rows_since_last_flush = 0  # 初始化批量推送计数器
         self.storage_mode = 'api'
         self._load_api_config()
+        # 攒够一批后封装为PushJob交给后台线程推送；推送失败的批次保留到下次提交时重试
+        self._push_state_lock = threading.Lock()
+        self._failed_jobs = []
+        self._failed_file_lock = threading.Lock()  # 多个推送线程串行追加失败记录，避免JSON行交错
+        self._push_worker = PushWorker(self._push_job, queue_size=self.push_queue_size, workers=self.push_concurrency)
         if self.api_enabled:
             if self.push_save_failed:
                 print(Fore.GREEN + f"接口推送模式已启用: {self.push_api_url}（失败会落地到 {self.push_failed_file}）")
@@ -150,7 +166,7 @@ class Storage:
         }
 
     def get_sink_label(self):
-        return 'CSV' if self.storage_mode == 'api' else '数据库'
+        return '数据文件' if self.storage_mode == 'api' else '数据库'
 
     # -------------------- API mode --------------------
     def _load_api_config(self):
@@ -171,6 +187,26 @@ class Storage:
         self.push_api_batch_size = max(1, self.push_api_batch_size)
         self.push_channel = (os.getenv('PUSH_CHANNEL') or '').strip()
 
+        try:
+            self.push_buffer_max_rows = int((os.getenv('PUSH_BUFFER_MAX_ROWS') or '0').strip())
+        except ValueError:
+            self.push_buffer_max_rows = 0
+        if self.push_buffer_max_rows <= 0:
+            self.push_buffer_max_rows = 2 * self.push_api_batch_size
+
+        try:
+            self.push_concurrency = max(1, int((os.getenv('PUSH_CONCURRENCY') or '4').strip()))
+        except ValueError:
+            self.push_concurrency = 4
+        try:
+            self.push_queue_size = int((os.getenv('PUSH_QUEUE_SIZE') or '0').strip())
+        except ValueError:
+            self.push_queue_size = 0
+        if self.push_queue_size <= 0:
+            self.push_queue_size = 2 * self.push_concurrency
+        # 为空时不发送幂等键
+        self.push_idempotency_header = (os.getenv('PUSH_IDEMPOTENCY_HEADER', 'Idempotency-Key') or '').strip()
+
         self.push_verify_ssl = self._parse_bool(os.getenv('PUSH_VERIFY_SSL'), True)
         self.push_api_auth_token = (os.getenv('PUSH_API_AUTH_TOKEN') or '').strip()
         self.push_save_failed = self._parse_bool(os.getenv('PUSH_SAVE_FAILED'), False)
@@ -196,6 +232,17 @@ class Storage:
             if failed_dir and not os.path.exists(failed_dir):
                 os.makedirs(failed_dir, exist_ok=True)
 
+        try:
+            self.storage_flush_rows = max(1, int((os.getenv('STORAGE_FLUSH_ROWS') or '100').strip()))
+        except ValueError:
+            self.storage_flush_rows = 100
+        try:
+            self.storage_flush_interval_ms = max(0, int((os.getenv('STORAGE_FLUSH_INTERVAL_MS') or '1000').strip()))
+        except ValueError:
+            self.storage_flush_interval_ms = 1000
+        self.storage_fsync = self._parse_bool(os.getenv('STORAGE_FSYNC'), False)
+        self.export_csv_on_close = self._parse_bool(os.getenv('STORAGE_EXPORT_CSV'), False)
+
         self.api_enabled = bool(self.push_api_url)
 
     def _build_api_headers(self):
@@ -208,6 +255,29 @@ class Storage:
             headers['Authorization'] = f"Bearer {self.push_api_auth_token}"
         return headers
 
+    def _build_idempotency_key(self, body):
+        """同一批订单、同样内容的推送请求得到相同的幂等键，重试和并发发送可以安全去重
+
+        不包含date字段：缺少创建时间时它取当前日期，跨零点重试会变化；订单日期已由order_create_time体现。
+        """
+        order_nos = '\n'.join(self._to_text(item.get('order_no')) for item in body['items'])
+        stable_body = {
+            'channel': body['channel'],
+            'items': [{key: value for key, value in item.items() if key != 'date'} for item in body['items']],
+        }
+        content = json.dumps(stable_body, ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str)
+        content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        return hashlib.sha256(f"{order_nos}\n{content_hash}".encode('utf-8')).hexdigest()
+
+    def _push_session(self):
+        session = getattr(self._push_local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            self._push_local.session = session
+            with self._push_state_lock:
+                self._push_sessions.append(session)
+        return session
+
     def _parse_datetime_for_api(self, value):
         if value is None or value == '':
             return ''
@@ -348,94 +418,101 @@ class Storage:
 
         return mapped
 
-    def _new_csv_filename(self):
+    def _new_spool_filename(self):
         timestamp = datetime.now(WAT_TZ).strftime('%Y%m%d_%H%M%S')
-        filename = f"{timestamp}_order_details.csv"
+        filename = f"{timestamp}_order_details.jsonl"
         candidate = os.path.join(self.data_dir, filename)
         if not os.path.exists(candidate):
             return candidate
 
         index = 1
         while True:
-            filename = f"{timestamp}_{index:02d}_order_details.csv"
+            filename = f"{timestamp}_{index:02d}_order_details.jsonl"
             candidate = os.path.join(self.data_dir, filename)
             if not os.path.exists(candidate):
                 return candidate
             index += 1
 
-    def _start_new_csv_session_locked(self):
-        self._current_csv_file_path = self._new_csv_filename()
-        self._current_csv_headers = []
-        self._last_pushed_csv_file_path = ''
+    def _open_spool_locked(self):
+        """打开当前会话的数据段写入器（只追加）"""
+        if self._spool is not None:
+            return self._spool
+        if not self._current_spool_path:
+            self._start_new_spool_session_locked()
+        self._spool = SpoolSegment(
+            self._current_spool_path,
+            flush_rows=self.storage_flush_rows,
+            flush_interval_ms=self.storage_flush_interval_ms,
+            fsync=self.storage_fsync,
+        )
+        return self._spool
+
+    def _close_spool_locked(self):
+        """刷盘并关闭当前数据段；STORAGE_EXPORT_CSV=1 时同时导出CSV"""
+        spool = self._spool
+        self._spool = None
+        if spool is None:
+            return
+        spool.close()
+        if self.export_csv_on_close and os.path.getsize(spool.path) > 0:
+            self._export_csv_locked(spool.path)
+
+    def _start_new_spool_session_locked(self):
+        self._close_spool_locked()
+        self._current_spool_path = self._new_spool_filename()
+        self._pending_payloads = []
+        self._pending_overflow = False
+        self._pending_order_nos = []
         self._api_rows_since_last_flush = 0  # 重置批量推送计数器
-        return self._current_csv_file_path
+        return self._current_spool_path
 
-    def start_csv_session(self, auth_info=None, force_new=False):
+    def start_spool_session(self, auth_info=None, force_new=False):
         with self.write_lock:
             if self.storage_mode != 'api':
                 return ''
 
             account_info = self.resolve_account_info(auth_info)
             self._last_account_info_api = account_info
-            if force_new or not self._current_csv_file_path:
-                csv_path = self._start_new_csv_session_locked()
-                print(Fore.GREEN + f"已创建CSV文件: {csv_path}")
-            return self._current_csv_file_path
-
-    def _expand_current_csv_headers_locked(self, extra_headers):
-        if not extra_headers:
-            return
-        if not self._current_csv_file_path or not os.path.exists(self._current_csv_file_path):
-            self._current_csv_headers.extend(extra_headers)
-            return
-
-        new_headers = self._current_csv_headers + extra_headers
-        temp_path = f"{self._current_csv_file_path}.tmp"
-        with open(self._current_csv_file_path, 'r', encoding='utf-8-sig', newline='') as src:
-            reader = csv.DictReader(src)
-            old_rows = list(reader)
-
-        with open(temp_path, 'w', encoding='utf-8-sig', newline='') as dst:
-            writer = csv.DictWriter(dst, fieldnames=new_headers)
-            writer.writeheader()
-            for row in old_rows:
-                writer.writerow({h: self._to_text(row.get(h, '')) for h in new_headers})
-
-        os.replace(temp_path, self._current_csv_file_path)
-        self._current_csv_headers = new_headers
+            if force_new or not self._current_spool_path:
+                spool_path = self._start_new_spool_session_locked()
+                print(Fore.GREEN + f"已创建数据文件: {spool_path}")
+            return self._current_spool_path
 
-    def _append_rows_to_current_csv_locked(self, data_list):
+    def _append_rows_to_spool_locked(self, data_list, account_info):
+        """订单追加到数据段，同时把接口payload放入内存缓冲"""
         rows = [dict(item) for item in data_list if item]
         if not rows:
             return 0
 
-        if not self._current_csv_file_path:
-            self._start_new_csv_session_locked()
-
-        if not self._current_csv_headers:
-            self._current_csv_headers = list(rows[0].keys())
-
-        known = set(self._current_csv_headers)
-        extra_headers = []
-        for row in rows:
-            for key in row.keys():
-                if key not in known:
-                    known.add(key)
-                    extra_headers.append(key)
-
-        if extra_headers:
-            self._expand_current_csv_headers_locked(extra_headers)
+        self._open_spool_locked().append(rows)
+        self._pending_order_nos.extend(self._to_text(row.get('order_no')) for row in rows)
+        if not self._pending_overflow:
+            self._pending_payloads.extend(self._build_order_payload_for_api(row, account_info) for row in rows)
+            if len(self._pending_payloads) > self.push_buffer_max_rows:
+                print(Fore.YELLOW + f"待推送缓冲超过 {self.push_buffer_max_rows} 条，释放内存，推送时从数据文件重放")
+                self._pending_payloads = []
+                self._pending_overflow = True
+        return len(rows)
 
-        file_exists = os.path.exists(self._current_csv_file_path)
-        needs_header = (not file_exists) or os.path.getsize(self._current_csv_file_path) == 0
-        with open(self._current_csv_file_path, 'a', encoding='utf-8-sig', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=self._current_csv_headers)
-            if needs_header:
-                writer.writeheader()
-            for row in rows:
-                writer.writerow({h: self._to_text(row.get(h, '')) for h in self._current_csv_headers})
+    def _export_csv_locked(self, spool_path, csv_path=None):
+        if self._spool is not None and self._spool.path == spool_path:
+            self._spool.flush()
+        csv_path = csv_path or default_csv_path(spool_path)
+        count = export_spool_to_csv(spool_path, csv_path, to_text=self._to_text)
+        print(Fore.GREEN + f"已导出CSV: file={csv_path} count={count}")
+        return csv_path
 
-        return len(rows)
+    def export_csv(self, spool_path=None, csv_path=None):
+        """把数据段导出为CSV（表头为所有列的并集），默认导出当前会话，当前会话为空时导出最近推送完成的会话"""
+        with self.write_lock:
+            if not spool_path:
+                spool_path = self._current_spool_path
+                if self._spool is None or self._spool.row_count == 0:
+                    spool_path = self._last_pushed_spool_path or spool_path
+            if not spool_path or not os.path.exists(spool_path):
+                print(Fore.YELLOW + f"数据文件不存在，无法导出CSV: {spool_path}")
+                return ''
+            return self._export_csv_locked(spool_path, csv_path)
 
     def _persist_failed_payload(self, payload, error_message):
         print(Fore.RED + f"接口推送失败: {error_message}")
@@ -447,8 +524,10 @@ class Storage:
             'target_url': self.push_api_url,
             'payload': payload,
         }
-        with open(self.push_failed_file, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        with self._failed_file_lock:
+            with open(self.push_failed_file, 'a', encoding='utf-8') as f:
+                f.write(line)
 
     def _send_orders_to_api(self, orders, account_info):
         channel_value = ''
@@ -469,7 +548,9 @@ class Storage:
         try:
             print(Fore.YELLOW + f"⏳ 正在推送 {len(orders)} 条数据到 {self.push_api_url}...")
             headers = self._build_api_headers()
-            response = self.session.request(
+            if self.push_idempotency_header:
+                headers[self.push_idempotency_header] = self._build_idempotency_key(body)
+            response = self._push_session().request(
                 method=self.push_api_method,
                 url=self.push_api_url,
                 json=body,
@@ -503,50 +584,114 @@ class Storage:
             self._persist_failed_payload(body, str(e))
             return False
 
-    def _push_csv_to_api_locked(self, csv_file_path, account_info):
-        if not csv_file_path or not os.path.exists(csv_file_path):
-            print(Fore.YELLOW + f"CSV文件不存在，跳过推送: {csv_file_path}")
-            return False, 0
+    def _replay_spool_payloads(self, job):
+        """从已关闭的数据段重建批次对应行的payload（内存缓冲已释放时使用）"""
+        if not os.path.exists(job.spool_path):
+            return []
+        rows = itertools.islice(iter_spool_rows(job.spool_path), job.row_start, job.row_start + job.row_count)
+        payloads = [self._build_order_payload_for_api(row, job.account_info) for row in rows]
+        print(Fore.CYAN + f"从数据文件重放 {len(payloads)} 条待推送订单: {job.spool_path}")
+        return payloads
+
+    def _push_job(self, job):
+        """后台线程：推送一个批次，失败时保留批次等待重试"""
+        if job.payloads is None:
+            job.payloads = self._replay_spool_payloads(job)
+
+        if len(job.payloads) < job.row_count:
+            # 数据段缺失或行数不足：这些订单并没有推送，不能当作送达
+            print(Fore.RED + f"数据文件只重放出 {len(job.payloads)} / {job.row_count} 条订单，批次将在下次推送时重试: {job.spool_path}")
+            job.payloads = None
+            self._retain_failed_job(job)
+            return False
 
-        with open(csv_file_path, 'r', encoding='utf-8-sig', newline='') as f:
-            reader = csv.DictReader(f)
-            rows = [row for row in reader]
+        if not self._send_orders_to_api(job.payloads, job.account_info):
+            print(Fore.RED + f"批量推送失败，{job.row_count} 条数据将在下次推送时重试")
+            self._retain_failed_job(job)
+            return False
 
-        if not rows:
-            print(Fore.YELLOW + f"CSV没有可推送数据: {csv_file_path}")
-            return True, 0
-
-        prepared_orders = [self._build_order_payload_for_api(row, account_info) for row in rows]
-        total_sent = 0
-        for i in range(0, len(prepared_orders), self.push_api_batch_size):
-            batch = prepared_orders[i:i + self.push_api_batch_size]
-            ok = self._send_orders_to_api(batch, account_info)
-            if not ok:
-                print(Fore.RED + f"批量推送失败，已推送 {total_sent} 条数据")
-                return False, total_sent
-            total_sent += len(batch)
-
-        # ✅ 推送成功后，开始新的 CSV 会话
-        print(Fore.GREEN + f"CSV推送全部成功，共 {total_sent} 条，开始新的会话...")
-        self._start_new_csv_session_locked()
-        return True, total_sent
+        job.sent = job.row_count
+        job.payloads = []
+        with self._push_state_lock:
+            self._last_pushed_spool_path = job.spool_path
+        self._notify_delivered(job.order_nos)
+        print(Fore.GREEN + f"✅ 数据文件推送完成: file={job.spool_path} rows={job.row_start + 1}-{job.row_start + job.row_count}")
+        return True
+
+    def add_delivery_listener(self, listener):
+        """注册送达回调listener(order_nos)：订单推送成功（或写入数据库提交）后调用，可能在后台推送线程中执行"""
+        with self._push_state_lock:
+            self._delivery_listeners.append(listener)
+
+    def remove_delivery_listener(self, listener):
+        with self._push_state_lock:
+            if listener in self._delivery_listeners:
+                self._delivery_listeners.remove(listener)
+
+    def _notify_delivered(self, order_nos):
+        with self._push_state_lock:
+            listeners = list(self._delivery_listeners)
+        for listener in listeners:
+            try:
+                listener(order_nos)
+            except Exception as e:
+                print(Fore.YELLOW + f"送达回调执行失败: {str(e)}")
+
+    def _retain_failed_job(self, job):
+        with self._push_state_lock:
+            self._failed_jobs.append(job)
+            retained = sum(len(failed.payloads) for failed in self._failed_jobs if failed.payloads is not None)
+            if retained > self.push_buffer_max_rows:
+                print(Fore.YELLOW + f"推送失败的批次超过 {self.push_buffer_max_rows} 条，释放内存，重试时从数据文件重放")
+                for failed in self._failed_jobs:
+                    failed.payloads = None
+
+    def _seal_pending_locked(self, account_info):
+        """把当前数据段按PUSH_API_BATCH_SIZE切分为推送批次，并开始新的数据段"""
+        if self._spool is None or self._spool.row_count == 0:
+            return []
+        spool_path = self._spool.path
+        row_count = self._spool.row_count
+        jobs = []
+        for row_start in range(0, row_count, self.push_api_batch_size):
+            batch_rows = min(self.push_api_batch_size, row_count - row_start)
+            payloads = None
+            if not self._pending_overflow:
+                payloads = self._pending_payloads[row_start:row_start + batch_rows]
+            order_nos = self._pending_order_nos[row_start:row_start + batch_rows]
+            jobs.append(PushJob(spool_path, payloads, row_start, batch_rows, account_info, order_nos))
+        self._start_new_spool_session_locked()
+        return jobs
+
+    def _submit_pending_locked(self, account_info):
+        """提交之前失败的批次和当前数据段，推送队列满时阻塞；返回本次提交的批次"""
+        with self._push_state_lock:
+            jobs = self._failed_jobs
+            self._failed_jobs = []
+        jobs.extend(self._seal_pending_locked(account_info))
+        for pending_job in jobs:
+            self._push_worker.submit(pending_job)
+        return jobs
 
     def _flush_pending_locked(self, auth_info=None):
-        """内部 flush 方法，假设 write_lock 已持有"""
+        """内部 flush 方法，假设 write_lock 已持有；提交全部待推送数据并等待后台推送完成"""
         if self.storage_mode != 'api':
             return True
 
-        if not self._current_csv_file_path:
-            return True
-
         account_info = self.resolve_account_info(auth_info) if auth_info else (
             self._last_account_info_api or {'account_id': self.push_channel or 'palmpay'}
         )
-        ok, sent = self._push_csv_to_api_locked(self._current_csv_file_path, account_info)
-        if ok and sent > 0:
-            print(Fore.GREEN + f"✅ CSV推送完成: file={self._current_csv_file_path} count={sent}")
-            self._last_pushed_csv_file_path = self._current_csv_file_path
-        return ok
+        jobs = self._submit_pending_locked(account_info)
+        self._push_worker.wait_idle()
+        return all(job.pending_rows == 0 for job in jobs)
+
+    def get_push_stats(self):
+        """后台推送状态：队列深度、推送延迟（最久未完成批次的等待秒数）、内存中待推送及失败待重试的行数"""
+        stats = self._push_worker.stats()
+        with self._push_state_lock:
+            stats['failed_rows'] = sum(job.pending_rows for job in self._failed_jobs)
+        stats['buffered_rows'] = self._spool.row_count if self._spool is not None else 0
+        return stats
 
     def flush_pending(self, auth_info=None):
         """外部调用的 flush 方法，会获取锁"""
@@ -848,7 +993,7 @@ class Storage:
 
     # -------------------- unified write API --------------------
     def append_single_to_db(self, data_item, auth_info=None):
-        """实时写入单条订单到CSV或数据库"""
+        """实时写入单条订单到数据文件或数据库"""
         if not data_item:
             print(Fore.RED + '没有数据需要写入')
             return False
@@ -858,7 +1003,7 @@ class Storage:
 
             if self.storage_mode == 'api':
                 self._last_account_info_api = account_info
-                written = self._append_rows_to_current_csv_locked([data_item])
+                written = self._append_rows_to_spool_locked([data_item], account_info)
 
                 # ✅ 新增：攒够 batch 就推一次（不等爬完）
                 # 基于实际写入的行数来计数
@@ -867,13 +1012,16 @@ class Storage:
                     print(Fore.CYAN + f"[Progress] 累积行数: {self._api_rows_since_last_flush} / {self.push_api_batch_size}")
                     
                     if self._api_rows_since_last_flush >= self.push_api_batch_size:
-                        print(Fore.YELLOW + f"【批量推送触发】累积达到 {self._api_rows_since_last_flush} 行，开始推送...")
+                        print(Fore.YELLOW + f"【批量推送触发】累积达到 {self._api_rows_since_last_flush} 行，提交后台推送...")
                         self._api_rows_since_last_flush = 0
-                        ok = self._flush_pending_locked(auth_info=auth_info)
-                        if ok:
-                            print(Fore.GREEN + "✅ 批量推送成功")
-                        else:
-                            print(Fore.RED + "❌ 批量推送失败，数据将在爬虫完成时重试")
+                        # 只在推送队列已满时阻塞，HTTP推送由后台线程完成
+                        self._submit_pending_locked(account_info)
+                        stats = self._push_worker.stats()
+                        print(
+                            Fore.CYAN
+                            + f"[Push] 推送队列 {stats['queue_depth']}/{stats['queue_max']}，"
+                            + f"待推送 {stats['outstanding_rows']} 行，推送延迟 {stats['push_lag']:.1f}s"
+                        )
 
                 return written == 1
 
@@ -882,6 +1030,7 @@ class Storage:
                 self._upsert_account(account_info)
                 order_no = self._upsert_order(account_info['account_id'], data_item)
                 self.conn.commit()
+                self._notify_delivered([self._to_text(data_item.get('order_no'))])
                 print(
                     Fore.GREEN
                     + f"订单已写入数据库: account={account_info['account_id']} order_no={order_no}"
@@ -894,7 +1043,7 @@ class Storage:
                 return False
 
     def save_to_db(self, data_list, auth_info=None):
-        """批量写入订单到CSV或数据库"""
+        """批量写入订单到数据文件或数据库"""
         if not data_list:
             print(Fore.RED + '没有数据需要写入')
             return False
@@ -904,13 +1053,17 @@ class Storage:
 
             if self.storage_mode == 'api':
                 self._last_account_info_api = account_info
-                csv_path = self._start_new_csv_session_locked()
-                saved_count = self._append_rows_to_current_csv_locked(data_list)
+                spool_path = self._start_new_spool_session_locked()
+                saved_count = self._append_rows_to_spool_locked(data_list, account_info)
                 if saved_count <= 0:
                     return False
-                ok, sent = self._push_csv_to_api_locked(csv_path, account_info)
+                jobs = self._seal_pending_locked(account_info)
+                for job in jobs:
+                    self._push_worker.submit(job)
+                self._push_worker.wait_idle()
+                ok = all(job.pending_rows == 0 for job in jobs)
                 if ok:
-                    print(Fore.GREEN + f"批量写入CSV并推送完成: file={csv_path} count={sent}")
+                    print(Fore.GREEN + f"批量写入数据文件并推送完成: file={spool_path} count={saved_count}")
                 return ok
 
             try:
@@ -925,6 +1078,7 @@ class Storage:
                     saved_count += 1
 
                 self.conn.commit()
+                self._notify_delivered([self._to_text(item.get('order_no')) for item in data_list if item])
                 print(
                     Fore.GREEN
                     + (
@@ -940,6 +1094,9 @@ class Storage:
                 return False
 
     # 兼容旧调用：统一切到当前存储模式
+    def start_csv_session(self, auth_info=None, force_new=False):
+        return self.start_spool_session(auth_info=auth_info, force_new=force_new)
+
     def append_single_to_csv(self, data_item, auth_info=None):
         return self.append_single_to_db(data_item, auth_info=auth_info)
 
@@ -975,10 +1132,22 @@ class Storage:
             pass
 
         try:
-            self.session.close()
+            self._push_worker.stop()
         except Exception:
             pass
 
+        try:
+            with self.write_lock:
+                self._close_spool_locked()
+        except Exception:
+            pass
+
+        for session in self._push_sessions:
+            try:
+                session.close()
+            except Exception:
+                pass
+
         try:
             if self.conn:
                 self.conn.close()
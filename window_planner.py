@@ -0,0 +1,148 @@
+import concurrent.futures
+import math
+
+from colorama import Fore
+
+from utils import logger
+
+
+class WindowPlanError(RuntimeError):
+    """有时间窗口的第1页多次探测都失败，无法确定其中的订单数"""
+
+
+class CrawlWindowPlanner:
+    """根据列表接口第1页返回的totalCount，递归二分时间窗口，直到每个子窗口的页数不超过上限"""
+
+    def __init__(self, crawler, max_pages_per_window, min_window_ms=1000, max_workers=1, probe_attempts=3):
+        self.crawler = crawler
+        self.max_pages_per_window = max(1, int(max_pages_per_window))
+        self.min_window_ms = max(1, int(min_window_ms))
+        self.max_workers = max(1, int(max_workers))
+        self.probe_attempts = max(1, int(probe_attempts))
+        # 探测时拿到的第1页结果，爬取时直接复用，避免重复请求：(start, end) -> (orders, pagination)
+        self._first_pages = {}
+
+    def _probe(self, start_timestamp, end_timestamp, settlement_status):
+        """请求窗口第1页，返回(orders, pagination, total)；请求失败时total为None（与"没有订单"区分）"""
+        orders, pagination = self.crawler.get_order_list_from_api(
+            start_timestamp,
+            end_timestamp,
+            page_number=1,
+            page_size=self.crawler.page_size,
+            settlement_status=settlement_status,
+        )
+        if pagination.get('failed'):
+            return orders, pagination, None
+        total = pagination.get('total', 0) or 0
+        if not total and orders:
+            total = len(orders)
+        return orders, pagination, total
+
+    def _should_stop(self, stop_event):
+        return not getattr(self.crawler, 'is_running', True) or (stop_event is not None and stop_event.is_set())
+
+    def plan(self, start_timestamp, end_timestamp, settlement_status=None, stop_event=None):
+        """生成爬取计划：窗口列表、预计页数和预计请求数
+
+        规划中途收到停止信号时interrupted为True，unplanned为尚未探测完的时间范围，此时窗口列表不完整，不能当作完整计划使用。
+        """
+        start_timestamp = int(start_timestamp)
+        end_timestamp = int(end_timestamp)
+        page_size = int(self.crawler.page_size) or 1
+        self._first_pages = {}
+
+        windows = []
+        probe_requests = 0
+        # (start, end) -> 已失败的探测次数
+        probe_failures = {}
+        pending = [(start_timestamp, end_timestamp)]
+        interrupted = False
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending:
+                if self._should_stop(stop_event):
+                    interrupted = True
+                    break
+                futures = {
+                    executor.submit(self._probe, window_start, window_end, settlement_status): (window_start, window_end)
+                    for window_start, window_end in pending
+                }
+                pending = []
+                for future in concurrent.futures.as_completed(futures):
+                    window_start, window_end = futures[future]
+                    orders, pagination, total = future.result()
+                    probe_requests += 1
+                    if total is None:
+                        failures = probe_failures.get((window_start, window_end), 0) + 1
+                        probe_failures[(window_start, window_end)] = failures
+                        if failures >= self.probe_attempts:
+                            raise WindowPlanError(
+                                f"时间窗口 {window_start}-{window_end} 第1页连续 {failures} 次获取失败，无法规划爬取窗口"
+                            )
+                        logger.warning(f"时间窗口 {window_start}-{window_end} 第1页获取失败，第 {failures} 次重试探测")
+                        pending.append((window_start, window_end))
+                        continue
+                    if total <= 0:
+                        continue
+
+                    pages = math.ceil(total / page_size)
+                    if pages > self.max_pages_per_window and window_end - window_start + 1 > self.min_window_ms:
+                        middle = window_start + (window_end - window_start) // 2
+                        pending.append((window_start, middle))
+                        pending.append((middle + 1, window_end))
+                        continue
+
+                    if pages > self.max_pages_per_window:
+                        logger.warning(
+                            f"时间窗口 {window_start}-{window_end} 已达到最小宽度，仍有 {pages} 页，超过上限 {self.max_pages_per_window}"
+                        )
+                    self._first_pages[(window_start, window_end)] = (orders, pagination)
+                    windows.append({
+                        'start': window_start,
+                        'end': window_end,
+                        'total': total,
+                        'pages': pages,
+                    })
+
+        windows.sort(key=lambda window: window['start'])
+        expected_pages = sum(window['pages'] for window in windows)
+        total_orders = sum(window['total'] for window in windows)
+        return {
+            'windows': windows,
+            'window_count': len(windows),
+            'total_orders': total_orders,
+            'expected_pages': expected_pages,
+            # 列表请求（第1页已在探测时获取）+ 每个订单一次详情请求
+            'expected_requests': expected_pages - len(windows) + total_orders,
+            'probe_requests': probe_requests,
+            'max_pages_per_window': self.max_pages_per_window,
+            'interrupted': interrupted,
+            'unplanned': sorted(pending),
+        }
+
+    def take_first_page(self, start_timestamp, end_timestamp):
+        """取出探测阶段缓存的第1页结果（只能取一次）"""
+        return self._first_pages.pop((start_timestamp, end_timestamp), None)
+
+    def log_plan(self, plan, add_log=None):
+        if plan.get('interrupted'):
+            message = f"【爬取计划】规划被中断，还有 {len(plan['unplanned'])} 个时间范围未探测，本次不使用该计划"
+            print(Fore.YELLOW + message)
+            logger.warning(message)
+            if add_log:
+                add_log(message, 'yellow')
+            return
+        summary = (
+            f"【爬取计划】{plan['window_count']} 个时间窗口，共 {plan['total_orders']} 条订单，"
+            f"预计 {plan['expected_pages']} 页、{plan['expected_requests']} 次请求（探测请求 {plan['probe_requests']} 次）"
+        )
+        print(Fore.CYAN + summary)
+        logger.info(summary)
+        if add_log:
+            add_log(summary, 'cyan')
+        for index, window in enumerate(plan['windows'], 1):
+            detail = (
+                f"  窗口 {index}: {window['start']} - {window['end']} | "
+                f"{window['total']} 条订单 | {window['pages']} 页"
+            )
+            print(Fore.CYAN + detail)
+            logger.info(detail)